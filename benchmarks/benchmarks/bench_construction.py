@@ -0,0 +1,41 @@
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+import ipywidgets as widgets
+
+from .utils import WidgetBenchmark
+
+
+class TimeConstruction(WidgetBenchmark):
+    """Construct widgets of the most used classes."""
+    params = ['IntSlider', 'FloatSlider', 'Button', 'Text', 'Checkbox',
+              'Dropdown', 'HBox', 'Output', 'Layout']
+    param_names = ['widget']
+
+    def setup(self, name):
+        super().setup(name)
+        self.cls = getattr(widgets, name)
+
+    def time_construct(self, name):
+        self.cls()
+
+    def time_construct_many(self, name):
+        for i in range(100):
+            self.cls()
+
+    def time_create_many(self, name):
+        self.cls.create_many([{}] * 100)
+
+
+class TimeContainers(WidgetBenchmark):
+    """Construct containers of many children, and their embed state."""
+
+    def setup(self):
+        super().setup()
+        self.children = [widgets.IntSlider(value=i) for i in range(200)]
+
+    def time_vbox(self):
+        widgets.VBox(self.children)
+
+    def time_manager_state(self):
+        widgets.Widget.get_manager_state()
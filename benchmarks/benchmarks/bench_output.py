@@ -0,0 +1,28 @@
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from IPython.display import Markdown
+
+from ipywidgets import Output
+
+from .utils import WidgetBenchmark
+
+
+class TimeOutput(WidgetBenchmark):
+    """Append outputs to an Output widget."""
+
+    def setup(self):
+        super().setup()
+        self.output = Output()
+
+    def time_append_stdout(self):
+        output = Output()
+        for i in range(100):
+            output.append_stdout('line %d\n' % i)
+
+    def time_append_display_data(self):
+        self.output.append_display_data(Markdown('**text**'))
+
+    def time_clear_output(self):
+        self.output.append_stdout('text')
+        self.output.clear_output()
@@ -0,0 +1,41 @@
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from ipywidgets import Dropdown, SelectMultiple
+
+from .utils import WidgetBenchmark
+
+
+class TimeSelection(WidgetBenchmark):
+    """Select in widgets with large options."""
+    params = [100, 10000]
+    param_names = ['options']
+
+    def setup(self, n):
+        super().setup(n)
+        self.options = [('option %d' % i, i) for i in range(n)]
+        self.dropdown = Dropdown(options=self.options)
+        self.multiple = SelectMultiple(options=self.options)
+        self.last = n - 1
+
+    def time_construct(self, n):
+        Dropdown(options=self.options)
+
+    def time_set_value(self, n):
+        self.dropdown.value = self.last
+        self.dropdown.value = 0
+
+    def time_set_label(self, n):
+        self.dropdown.label = 'option %d' % self.last
+        self.dropdown.label = 'option 0'
+
+    def time_set_index(self, n):
+        self.dropdown.index = self.last
+        self.dropdown.index = 0
+
+    def time_set_options(self, n):
+        self.dropdown.options = self.options[::-1]
+
+    def time_multiple_set_value(self, n):
+        self.multiple.value = (0, self.last)
+        self.multiple.value = ()
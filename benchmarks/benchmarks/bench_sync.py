@@ -0,0 +1,65 @@
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from traitlets import Bytes, Dict, Int, List, Unicode
+
+from ipywidgets import Widget
+from ipywidgets.widgets.widget import _remove_buffers
+
+from .utils import WidgetBenchmark
+
+
+class SyncWidget(Widget):
+    value = Int().tag(sync=True)
+    label = Unicode().tag(sync=True)
+    items = List().tag(sync=True)
+    data = Bytes().tag(sync=True)
+    nested = Dict().tag(sync=True)
+
+
+class TimeSync(WidgetBenchmark):
+    """Send and receive state."""
+
+    def setup(self):
+        super().setup()
+        self.widget = SyncWidget(items=list(range(1000)), data=b'x' * 65536)
+        self.state = {'value': 1, 'label': 'label', 'items': list(range(1000))}
+
+    def time_send_state(self):
+        self.widget.send_state()
+
+    def time_send_state_key(self):
+        self.widget.send_state('value')
+
+    def time_set_trait(self):
+        self.widget.value += 1
+
+    def time_set_state(self):
+        self.widget.set_state(self.state)
+
+    def time_round_trip(self):
+        # a change from the front-end, which is not echoed back, followed by
+        # a change in the kernel
+        w = self.widget
+        w._handle_msg({'content': {'data': {'method': 'update', 'state': {'value': w.value + 1}}},
+                       'buffers': []})
+        w.value += 1
+
+    def time_get_state(self):
+        self.widget.get_state()
+
+
+class TimeRemoveBuffers(WidgetBenchmark):
+    """Separate the binary buffers of nested states."""
+    params = [10, 1000]
+    param_names = ['size']
+
+    def setup(self, size):
+        super().setup(size)
+        self.state = {
+            'plain': {'a': list(range(size)), 'b': {'c': 'text' * size}},
+            'binary': [{'x': memoryview(b'x' * 16), 'y': [1, 2, 3]} for i in range(size)],
+        }
+
+    def time_remove_buffers(self, size):
+        _remove_buffers(self.state)
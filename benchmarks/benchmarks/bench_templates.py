@@ -0,0 +1,28 @@
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from ipywidgets import Button, GridspecLayout
+
+from .utils import WidgetBenchmark
+
+
+class TimeGridspecLayout(WidgetBenchmark):
+    """Assign widgets to the cells of a GridspecLayout."""
+    params = [4, 16]
+    param_names = ['size']
+
+    def setup(self, size):
+        super().setup(size)
+        self.buttons = [Button() for i in range(size * size)]
+
+    def time_assign_cells(self, size):
+        grid = GridspecLayout(size, size)
+        buttons = iter(self.buttons)
+        for row in range(size):
+            for column in range(size):
+                grid[row, column] = next(buttons)
+
+    def time_assign_rows(self, size):
+        grid = GridspecLayout(size, size)
+        for row in range(size):
+            grid[row, :] = self.buttons[row]
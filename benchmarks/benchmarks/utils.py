@@ -0,0 +1,42 @@
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+
+from uuid import uuid4
+
+from ipykernel.comm import Comm
+from ipywidgets import Widget
+
+
+class NullComm(Comm):
+    """A comm which drops its messages, so that the benchmarks measure the
+    widgets and not the messaging."""
+    kernel = 'Truthy'
+
+    def __init__(self, *args, **kwargs):
+        self.comm_id = uuid4().hex
+        super().__init__(*args, **kwargs)
+
+    def open(self, *args, **kwargs):
+        pass
+
+    def send(self, *args, **kwargs):
+        pass
+
+    def close(self, *args, **kwargs):
+        pass
+
+
+class WidgetBenchmark:
+    """Base class of the benchmarks, creating the comms of the widgets with
+    NullComm."""
+
+    def setup(self, *params):
+        self._comm_default = Widget.__dict__.get('_comm_default')
+        Widget._comm_default = lambda self: NullComm()
+
+    def teardown(self, *params):
+        Widget.close_all()
+        if self._comm_default is None:
+            del Widget._comm_default
+        else:
+            Widget._comm_default = self._comm_default
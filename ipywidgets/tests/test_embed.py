@@ -89,7 +89,8 @@ class TestEmbed:
         state = data['manager_state']['state']
         views = data['view_specs']
 
-        assert len(state) == 7
+        # the default layouts of both widgets share one model
+        assert len(state) == 6
         assert len(views) == 2
 
         model_names = [s['model_name'] for s in state.values()]
@@ -116,7 +117,8 @@ class TestEmbed:
 
         state = dependency_state(w3)
 
-        assert len(state) == 9
+        # the default layouts of all widgets share one model
+        assert len(state) == 8
 
         model_names = [s['model_name'] for s in state.values()]
         assert 'IntTextModel' in model_names
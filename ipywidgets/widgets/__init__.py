@@ -5,7 +5,7 @@ from .widget import Widget, CallbackDispatcher, register, widget_serialization
 from .domwidget import DOMWidget
 from .valuewidget import ValueWidget
 
-from .trait_types import Color, Datetime, NumberFormat
+from .trait_types import Color, Datetime, NDArray, NumberFormat, array_serialization
 
 from .widget_core import CoreWidget
 from .widget_bool import Checkbox, ToggleButton, Valid
@@ -25,7 +25,7 @@ class DOMWidget(Widget):
     _dom_classes = TypedTuple(trait=Unicode(), help="CSS classes applied to widget DOM element").tag(sync=True)
     tabbable = Bool(help="Is widget tabbable?", allow_none=True, default_value=None).tag(sync=True)
     tooltip = Unicode(None, allow_none=True, help="A tooltip caption.").tag(sync=True)
-    layout = InstanceDict(Layout).tag(sync=True, **widget_serialization)
+    layout = InstanceDict(Layout, shared_default=True).tag(sync=True, **widget_serialization)
 
     def add_class(self, className):
         """
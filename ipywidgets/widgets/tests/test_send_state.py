@@ -1,11 +1,21 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 
-from traitlets import Bool, Tuple, List
+import hashlib
+import json
+import threading
+import zlib
+from collections import deque
 
-from .utils import setup, teardown
+import pytest
 
-from ..widget import Widget
+from traitlets import Bool, Tuple, List, Bytes, Unicode, Dict
+
+from .utils import setup, teardown, DummyComm
+
+from .. import widget as widget_module
+from ..widget import Widget, _compute_splice
+from ..trait_types import TypedTuple
 
 # A widget with simple traits
 class SimpleWidget(Widget):
@@ -23,3 +33,595 @@ def test_empty_hold_sync():
     with w.hold_sync():
         pass
     assert w.comm.messages == []
+
+class DummyLoop:
+    def __init__(self):
+        self.callbacks = []
+
+    def add_callback(self, callback, *args, **kwargs):
+        self.callbacks.append((callback, args, kwargs))
+
+    def call_later(self, delay, callback, *args, **kwargs):
+        self.callbacks.append((callback, args, kwargs))
+
+    def run_callbacks(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback, args, kwargs in callbacks:
+            callback(*args, **kwargs)
+
+def test_auto_batch(monkeypatch):
+    loop = DummyLoop()
+    monkeypatch.setattr(widget_module, '_get_event_loop', lambda: loop)
+    w = SimpleWidget()
+    w.auto_batch = True
+    w.a = True
+    w.c = [True]
+    w.a = False
+    assert w.comm.messages == []
+    assert len(loop.callbacks) == 1
+    loop.run_callbacks()
+    assert len(w.comm.messages) == 1
+    data = w.comm.messages[0][1]['data']
+    assert data['method'] == 'update'
+    assert data['state'] == {'a': False, 'c': [True]}
+    assert Widget._pending_batch == {}
+
+def test_auto_batch_without_loop():
+    w = SimpleWidget()
+    w.auto_batch = True
+    w.a = True
+    assert len(w.comm.messages) == 1
+
+def _widget_with_id(model_id):
+    comm = DummyComm()
+    comm.comm_id = model_id
+    return SimpleWidget(comm=comm)
+
+def test_hold_sync_all():
+    w1 = _widget_with_id('w1')
+    w2 = _widget_with_id('w2')
+    w3 = _widget_with_id('w3')
+    with Widget.hold_sync_all():
+        w1.a = True
+        with w2.hold_sync():
+            w2.c = [True]
+        w2.a = True
+        w1.c = [False]
+    assert w2.comm.messages == []
+    assert w3.comm.messages == []
+    assert len(w1.comm.messages) == 1
+    data = w1.comm.messages[0][1]['data']
+    assert data == {
+        'method': 'batch_update',
+        'updates': {
+            'w1': {'state': {'a': True, 'c': [False]}, 'versions': {'a': 1, 'c': 1}},
+            'w2': {'state': {'a': True, 'c': [True]}, 'versions': {'a': 1, 'c': 1}},
+        },
+        'buffer_paths': [],
+    }
+
+def test_hold_sync_all_single_widget():
+    w1 = _widget_with_id('w1')
+    with Widget.hold_sync_all():
+        w1.a = True
+    assert len(w1.comm.messages) == 1
+    data = w1.comm.messages[0][1]['data']
+    assert data['method'] == 'update'
+    assert data['state'] == {'a': True}
+
+def test_hold_sync_all_buffers():
+    w1 = _widget_with_id('w1')
+    w2 = _widget_with_id('w2')
+    w1.add_traits(d=Bytes().tag(sync=True))
+    w2.add_traits(d=Bytes().tag(sync=True))
+    w1.comm.messages.clear()
+    w2.comm.messages.clear()
+    with Widget.hold_sync_all():
+        w1.d = b'one'
+        w2.d = b'two'
+    (args, kwargs), = w1.comm.messages
+    assert kwargs['data']['buffer_paths'] == [['w1', 'state', 'd'], ['w2', 'state', 'd']]
+    assert kwargs['buffers'] == [b'one', b'two']
+
+def test_hold_sync_all_queued_widget():
+    x = _widget_with_id('x')
+    y = _widget_with_id('y')
+    x.add_traits(d=Bytes().tag(sync=True))
+    y.add_traits(d=Bytes().tag(sync=True))
+    x.chunk_size = 4
+    x.max_pending_chunks = 1
+    x.d = b'first-value'
+    x.comm.messages.clear()
+    # the update of x waits behind its chunked transfer instead of being
+    # batched ahead of it
+    with Widget.hold_sync_all():
+        y.d = b'y'
+        x.d = b'second'
+    assert [kwargs['data']['method'] for args, kwargs in y.comm.messages[-1:]] == ['update']
+    assert x.comm.messages == []
+    for i in range(5):
+        x._handle_msg({'content': {'data': {'method': 'chunk_ack'}}})
+    updates = [(kwargs['data'], kwargs['buffers']) for args, kwargs in x.comm.messages
+               if kwargs['data']['method'] == 'update']
+    assert [u[0]['transfer']['chunks'] for u in updates] == [[3], [2]]
+
+def test_auto_batch_several_widgets(monkeypatch):
+    loop = DummyLoop()
+    monkeypatch.setattr(widget_module, '_get_event_loop', lambda: loop)
+    w1 = _widget_with_id('w1')
+    w2 = _widget_with_id('w2')
+    w1.auto_batch = w2.auto_batch = True
+    w1.a = True
+    w2.a = True
+    assert len(loop.callbacks) == 1
+    loop.run_callbacks()
+    assert w2.comm.messages == []
+    data = w1.comm.messages[0][1]['data']
+    assert data['method'] == 'batch_update'
+    assert sorted(data['updates']) == ['w1', 'w2']
+
+def test_sync_rate(monkeypatch):
+    loop = DummyLoop()
+    monkeypatch.setattr(widget_module, '_get_event_loop', lambda: loop)
+    w = SimpleWidget(sync_rate=0.001)
+    w.comm.messages.clear()
+    w.a = True
+    assert len(w.comm.messages) == 1
+    # further changes are dropped until the end of the throttling window
+    w.c = [True]
+    w.c = [True, False]
+    w.a = False
+    assert len(w.comm.messages) == 1
+    assert len(loop.callbacks) == 1
+    loop.run_callbacks()
+    assert len(w.comm.messages) == 2
+    data = w.comm.messages[1][1]['data']
+    assert data['state'] == {'a': False, 'c': [True, False]}
+
+def test_sync_rate_without_loop():
+    w = SimpleWidget(sync_rate=0.001)
+    w.a = True
+    w.a = False
+    assert len(w.comm.messages) == 2
+
+class DeltaWidget(Widget):
+    d = TypedTuple(trait=Unicode()).tag(sync=True, delta=True)
+
+def test_compute_splice():
+    assert _compute_splice([1, 2, 3], [1, 2, 3]) is None
+    assert _compute_splice([1, 2, 3], [1, 2, 3, 4]) == [3, 0, [4]]
+    assert _compute_splice([1, 2, 3], [0, 1, 2, 3]) == [0, 0, [0]]
+    assert _compute_splice([1, 2, 3], [1, 3]) == [1, 1, []]
+    assert _compute_splice([1, 2, 3], [1, 5, 6, 3]) == [1, 1, [5, 6]]
+    assert _compute_splice([1, 1], [1, 1, 1]) == [2, 0, [1]]
+    assert _compute_splice([], [1]) == [0, 0, [1]]
+
+def test_delta_append():
+    w = DeltaWidget(d=('a', 'b', 'c'))
+    w.d += ('d',)
+    data = w.comm.messages[-1][1]['data']
+    assert data['state'] == {}
+    assert data['splices'] == {'d': [[3, 0, ['d']]]}
+    w.d = ('x',)
+    data = w.comm.messages[-1][1]['data']
+    assert data['state'] == {'d': ('x',)}
+    assert 'splices' not in data
+
+def test_delta_full_state_on_request():
+    w = DeltaWidget(d=('a', 'b', 'c'))
+    w._handle_msg({'content': {'data': {'method': 'request_state'}}})
+    data = w.comm.messages[-1][1]['data']
+    assert data['state']['d'] == ('a', 'b', 'c')
+    w.d += ('d',)
+    data = w.comm.messages[-1][1]['data']
+    assert data['splices'] == {'d': [[3, 0, ['d']]]}
+
+def test_delta_base_from_frontend():
+    w = DeltaWidget(d=('a', 'b', 'c'))
+    w.comm.messages.clear()
+    w.set_state({'d': ['a']})
+    assert w.comm.messages == []
+    w.d += ('b',)
+    data = w.comm.messages[-1][1]['data']
+    assert data['splices'] == {'d': [[1, 0, ['b']]]}
+
+def test_json_cache():
+    calls = []
+    def to_json(value, widget):
+        calls.append(value)
+        return list(value)
+
+    class CachedWidget(Widget):
+        d = List().tag(sync=True, to_json=to_json)
+
+    w = CachedWidget(d=[1])
+    w.get_state()
+    calls.clear()
+    w.get_state()
+    w._handle_msg({'content': {'data': {'method': 'request_state'}}})
+    assert calls == []
+    w.d = [2]
+    w.get_state()
+    w.get_state()
+    assert calls == [[2]]
+    # in place changes are sent when the key is sent explicitly
+    w.d.append(3)
+    w.send_state(k for k in ['d'])
+    assert w.comm.messages[-1][1]['data']['state'] == {'d': [2, 3]}
+    assert w.get_state()['d'] == [2, 3]
+    # and when the whole state is sent
+    w.d.append(4)
+    w.send_state()
+    assert w.comm.messages[-1][1]['data']['state']['d'] == [2, 3, 4]
+    assert w.get_state()['d'] == [2, 3, 4]
+
+def test_buffers_sync_flag():
+    class BinaryWidget(Widget):
+        a = Bool().tag(sync=True)
+        b = Tuple(Bool(), Unicode()).tag(sync=True)
+        c = TypedTuple(trait=Unicode()).tag(sync=True)
+        d = Bytes().tag(sync=True)
+        e = List().tag(sync=True)
+        f = List(Unicode()).tag(sync=True, to_json=lambda value, widget: value)
+        g = Bytes().tag(sync=True, buffers=False)
+
+    table = BinaryWidget._get_sync_table()
+    assert not any(table[k].buffers for k in 'abcg')
+    assert all(table[k].buffers for k in 'def')
+
+def test_buffers_sync_flag_traitlets4_dict():
+    # traitlets 4 names the value and per-key traits of Dict _trait and _traits
+    trait = Dict(Unicode())
+    trait._trait, trait._traits = trait._value_trait, None
+    del trait._value_trait, trait._per_key_traits
+    assert not widget_module._trait_may_contain_buffers(trait)
+    trait._traits = {'a': Bytes()}
+    assert widget_module._trait_may_contain_buffers(trait)
+
+def test_buffers_skipped_for_non_binary_traits():
+    class BinaryWidget(Widget):
+        a = Bool().tag(sync=True)
+        d = Bytes().tag(sync=True)
+
+    w = BinaryWidget()
+    w.add_traits(e=List().tag(sync=True))
+    w.comm.messages.clear()
+    with w.hold_sync():
+        w.a = True
+        w.d = b'one'
+        w.e = [b'two']
+    (args, kwargs), = w.comm.messages
+    assert kwargs['data']['state']['a'] is True
+    assert sorted(kwargs['data']['buffer_paths']) == [['d'], ['e', 0]]
+    assert sorted(kwargs['buffers']) == [b'one', b'two']
+
+def test_chunked_transfer():
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    w = BinaryWidget()
+    w.chunk_size = 4
+    w.max_pending_chunks = 2
+    w.comm.messages.clear()
+    w.d = b'0123456789'
+    # two chunks are sent, the rest waits for acknowledgements
+    sent = [(kwargs['data'], kwargs['buffers']) for args, kwargs in w.comm.messages]
+    assert sent == [
+        ({'method': 'chunk', 'transfer': 1, 'sequence': 0}, [b'0123']),
+        ({'method': 'chunk', 'transfer': 1, 'sequence': 1}, [b'4567']),
+    ]
+    w.send({'later': True})
+    for sequence in range(3):
+        w._handle_msg({'content': {'data': {'method': 'chunk_ack', 'transfer': 1, 'sequence': sequence}}})
+    (chunk, chunk_buffers), (update, buffers), (custom, custom_buffers) = [
+        (kwargs['data'], kwargs['buffers']) for args, kwargs in w.comm.messages[2:]]
+    assert chunk_buffers == [b'89']
+    assert update['method'] == 'update'
+    assert update['transfer'] == {'id': 1, 'chunks': [3]}
+    assert update['buffer_paths'] == [['d']]
+    assert buffers is None
+    assert custom['content'] == {'later': True}
+    assert w._send_queue == deque()
+    # small messages are not chunked
+    w.comm.messages.clear()
+    w.d = b'01'
+    (args, kwargs), = w.comm.messages
+    assert kwargs['data']['method'] == 'update'
+    assert kwargs['buffers'] == [b'01']
+
+def test_compression():
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+        e = Unicode().tag(sync=True)
+
+    w = BinaryWidget()
+    w.compression_threshold = 100
+    # nothing is compressed until the front-end accepts a codec
+    w.comm.messages.clear()
+    w.d = b'0' * 1000
+    (args, kwargs), = w.comm.messages
+    assert 'codec' not in kwargs['data']
+    w._handle_msg({'content': {'data': {'method': 'codecs', 'codecs': ['other', 'zlib']}}})
+    w.comm.messages.clear()
+    w.d = b'1' * 1000
+    w.e = 'x' * 1000
+    w.e = 'short'
+    (d_msg, d_buffers), (e_msg, e_buffers), (short_msg, short_buffers) = [
+        (kwargs['data'], kwargs['buffers']) for args, kwargs in w.comm.messages]
+    assert d_msg['codec'] == {'name': 'zlib', 'buffers': [0]}
+    assert zlib.decompress(d_buffers[0]) == b'1' * 1000
+    assert e_msg == {'method': 'update', 'codec': {'name': 'zlib', 'buffers': [], 'data': True}}
+    data = json.loads(zlib.decompress(e_buffers[-1]).decode('utf-8'))
+    assert data['state'] == {'e': 'x' * 1000}
+    assert 'codec' not in short_msg
+
+def test_codec_shared_by_widgets():
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    w1 = BinaryWidget()
+    w2 = BinaryWidget()
+    w1.compression_threshold = w2.compression_threshold = 100
+    # the front-end accepts the codecs once for all the widgets
+    w1._handle_msg({'content': {'data': {'method': 'codecs', 'codecs': ['zlib']}}})
+    w2.comm.messages.clear()
+    w2.d = b'0' * 1000
+    assert w2.comm.messages[-1][1]['data']['codec'] == {'name': 'zlib', 'buffers': [0]}
+    # and again after a state request
+    w1._handle_msg({'content': {'data': {'method': 'request_state'}}})
+    w2.d = b'1' * 1000
+    assert 'codec' not in w2.comm.messages[-1][1]['data']
+
+def test_compression_opt_in():
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    w = BinaryWidget()
+    w._handle_msg({'content': {'data': {'method': 'codecs', 'codecs': ['zlib']}}})
+    w.comm.messages.clear()
+    w.d = b'0' * 100000
+    assert 'codec' not in w.comm.messages[-1][1]['data']
+
+def test_compression_skips_incompressible_buffers(monkeypatch):
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    calls = []
+    def compress(data):
+        calls.append(memoryview(data).nbytes)
+        return zlib.compress(data)
+
+    monkeypatch.setattr(BinaryWidget, 'codecs', {'zlib': compress})
+    w = BinaryWidget()
+    w.compression_threshold = 100
+    w._handle_msg({'content': {'data': {'method': 'codecs', 'codecs': ['zlib']}}})
+    w.comm.messages.clear()
+    # only a sample of already compressed data is compressed
+    incompressible = hashlib.shake_256(b'seed').digest(100000)
+    w.d = incompressible
+    assert calls == [widget_module._COMPRESSION_SAMPLE_SIZE]
+    assert 'codec' not in w.comm.messages[-1][1]['data']
+    assert w.comm.messages[-1][1]['buffers'] == [incompressible]
+
+def test_json_size_exceeds():
+    value = {'state': {'a': 'x' * 50, 'b': list(range(20))}}
+    size = len(json.dumps(value, separators=(',', ':')))
+    assert widget_module._json_size_exceeds(value, 50)
+    assert not widget_module._json_size_exceeds(value, size)
+
+def test_state_reply_not_encoded():
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+        e = Unicode().tag(sync=True)
+
+    w = BinaryWidget(d=b'0' * 1000, e='x' * 1000)
+    w.compression_threshold = 100
+    w.chunk_size = 100
+    w._handle_msg({'content': {'data': {'method': 'codecs', 'codecs': ['zlib']}}})
+    # a reloaded front-end reads the reply to its state request directly
+    w.comm.messages.clear()
+    w._handle_msg({'content': {'data': {'method': 'request_state'}}})
+    (args, kwargs), = w.comm.messages
+    assert kwargs['data']['state']['e'] == 'x' * 1000
+    assert 'codec' not in kwargs['data'] and 'transfer' not in kwargs['data']
+    assert kwargs['buffers'] == [b'0' * 1000]
+    # the codec is negotiated again
+    w.comm.messages.clear()
+    w.chunk_size = None
+    w.e = 'y' * 1000
+    assert 'codec' not in w.comm.messages[-1][1]['data']
+    w._handle_msg({'content': {'data': {'method': 'codecs', 'codecs': ['zlib']}}})
+    w.e = 'z' * 1000
+    assert 'codec' in w.comm.messages[-1][1]['data']
+
+def store_hash(buffer):
+    return hashlib.blake2b(buffer, digest_size=32).hexdigest()
+
+def test_buffer_store(monkeypatch):
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    store = widget_module._BufferStore(min_size=4)
+    monkeypatch.setattr(Widget, '_buffer_store', store)
+    w1 = BinaryWidget()
+    w2 = BinaryWidget()
+    # nothing is stored until the capacity is negotiated
+    w1.d = b'image'
+    assert 'buffer_store' not in w1.comm.messages[-1][1]['data']
+    w1._handle_msg({'content': {'data': {'method': 'buffer_store', 'capacity': 2}}})
+    assert store.capacity == 2
+    w1.d = b'shared'
+    assert w1.comm.messages[-1][1]['data']['buffer_store'] == {
+        'capacity': 2, 'entries': [[0, store_hash(b'shared'), 'put']]}
+    w2.d = b'shared'
+    data, buffers = w2.comm.messages[-1][1]['data'], w2.comm.messages[-1][1]['buffers']
+    assert data['buffer_store']['entries'] == [[0, store_hash(b'shared'), 'ref']]
+    assert buffers == [b'']
+    # the least recently used buffers are evicted
+    w1.d = b'other'
+    w1.d = b'third'
+    w2.send_state('d')
+    assert w2.comm.messages[-1][1]['data']['buffer_store']['entries'][0][2] == 'put'
+    # small buffers are not stored
+    w1.d = b'abc'
+    assert 'buffer_store' not in w1.comm.messages[-1][1]['data']
+    # the store is reset when the front-end requests the state, and the
+    # reply carries its buffers without using the store
+    w2._handle_msg({'content': {'data': {'method': 'request_state'}}})
+    data, buffers = w2.comm.messages[-1][1]['data'], w2.comm.messages[-1][1]['buffers']
+    assert 'buffer_store' not in data
+    assert buffers == [b'shared']
+    w2.send_state('d')
+    data = w2.comm.messages[-1][1]['data']
+    assert data['buffer_store'] == {
+        'capacity': 2, 'entries': [[0, store_hash(b'shared'), 'put']], 'reset': True}
+
+def test_buffer_store_not_used_by_queued_messages(monkeypatch):
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    store = widget_module._BufferStore(min_size=4)
+    store.capacity = 2
+    monkeypatch.setattr(Widget, '_buffer_store', store)
+    w1 = BinaryWidget()
+    w2 = BinaryWidget()
+    w1.chunk_size = 4
+    w1.max_pending_chunks = 1
+    w1.d = b'gallery'
+    # the chunked message waits for acknowledgements, so another widget
+    # cannot reference its buffer in the store
+    w2.d = b'gallery'
+    assert w2.comm.messages[-1][1]['data']['buffer_store']['entries'][0][2] == 'put'
+    w1._handle_msg({'content': {'data': {'method': 'chunk_ack'}}})
+    w1._handle_msg({'content': {'data': {'method': 'chunk_ack'}}})
+    update = w1.comm.messages[-1][1]['data']
+    assert update['transfer'] == {'id': 1, 'chunks': [2]}
+    assert 'buffer_store' not in update
+
+def test_buffer_store_digests(monkeypatch):
+    class BinaryWidget(Widget):
+        d = Bytes().tag(sync=True)
+
+    store = widget_module._BufferStore(min_size=4)
+    store.capacity = 2
+    digests = widget_module._BufferDigests(min_size=4)
+    monkeypatch.setattr(Widget, '_buffer_store', store)
+    monkeypatch.setattr(widget_module, '_buffer_digests', digests)
+    w = BinaryWidget()
+    # the digests cache holds references to the buffers, so it is only
+    # used when digest_buffers is set
+    w.d = b'large buffer'
+    assert digests._digests == {}
+    w.digest_buffers = True
+    w.d = b'other buffer'
+    assert len(digests._digests) == 1
+
+def test_sync_stats():
+    class StatsWidget(Widget):
+        a = Bool().tag(sync=True)
+        d = Bytes().tag(sync=True)
+        collect_sync_stats = True
+
+    Widget.sync_stats(reset=True)
+    w = StatsWidget()
+    observed = []
+    w.observe(observed.append, 'a')
+    w.a = True
+    w.d = b'four'
+    w._handle_msg({'content': {'data': {'method': 'update', 'state': {'a': False}}},
+                   'buffers': []})
+    assert observed
+    stats = Widget.sync_stats(reset=True)
+    counts = stats['classes']['StatsWidget']
+    assert counts['messages_sent'] == 2
+    assert counts['messages_received'] == 1
+    assert counts['buffer_bytes_sent'] == 4
+    assert counts['json_bytes_sent'] > 0
+    assert counts['get_state_time'] > 0
+    assert counts['set_state_time'] > 0
+    traits = stats['traits']['StatsWidget']
+    assert traits['a']['updates_sent'] == 1
+    assert traits['a']['updates_received'] == 1
+    assert traits['a']['json_bytes_sent'] == len('true')
+    assert traits['a']['observers_time'] > 0
+    assert traits['d']['buffer_bytes_sent'] == 4
+    # only the synced traits are counted per trait
+    assert '_property_lock' not in traits and 'comm' not in traits
+    assert Widget.sync_stats() == {'classes': {}, 'traits': {}}
+    # widgets of other classes are not counted
+    SimpleWidget().a = True
+    assert Widget.sync_stats() == {'classes': {}, 'traits': {}}
+
+def test_middleware():
+    seen = []
+    def trace(widget, msg, buffers, call_next):
+        seen.append((widget, msg['method'], buffers))
+        call_next(msg, buffers)
+    def drop_c(widget, msg, buffers, call_next):
+        if 'c' not in msg.get('state', {}):
+            call_next(dict(msg, extra=True), buffers)
+    def uppercase(widget, msg, buffers, call_next):
+        call_next(msg, [bytes(b).upper() for b in buffers])
+
+    w = SimpleWidget()
+    Widget.register_middleware(trace)
+    Widget.register_middleware(drop_c)
+    Widget.register_middleware(uppercase, 'receive')
+    try:
+        w.a = True
+        w.c = [True]
+        received = []
+        w.on_msg(lambda widget, content, buffers: received.append(buffers))
+        w._handle_msg({'content': {'data': {'method': 'custom', 'content': {}}},
+                       'buffers': [b'abc']})
+    finally:
+        Widget.register_middleware(trace, remove=True)
+        Widget.register_middleware(drop_c, remove=True)
+        Widget.register_middleware(uppercase, 'receive', remove=True)
+    assert seen == [(w, 'update', []), (w, 'update', [])]
+    (args, kwargs), = w.comm.messages
+    assert kwargs['data']['state'] == {'a': True}
+    assert kwargs['data']['extra'] is True
+    assert received == [[b'ABC']]
+    assert Widget._send_middleware == () and Widget._receive_middleware == ()
+    with pytest.raises(ValueError):
+        Widget.register_middleware(trace, 'other')
+
+def test_thread_updates(monkeypatch):
+    loop = DummyLoop()
+    monkeypatch.setattr(widget_module, '_get_event_loop', lambda: loop)
+    w = SimpleWidget()
+    def work():
+        for i in range(10):
+            w.c = [True] * i
+        w.a = True
+        w.send({'done': True})
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    assert w.comm.messages == []
+    # the changes are coalesced and sent from the event loop, in order
+    assert len(loop.callbacks) == 2
+    loop.run_callbacks()
+    messages = [kwargs['data'] for args, kwargs in w.comm.messages]
+    assert len(messages) == 2
+    assert messages[0]['state'] == {'a': True, 'c': [True] * 9}
+    assert messages[1] == {'method': 'custom', 'content': {'done': True}}
+    # changes made in the main thread are sent right away
+    w.a = False
+    assert w.comm.messages[-1][1]['data']['state'] == {'a': False}
+
+def test_versions_after_reload():
+    w = SimpleWidget()
+    w.a = True
+    assert w.comm.messages[-1][1]['data']['versions'] == {'a': 1}
+    # a reloaded front-end requests the state, and restores its model from
+    # the reply without versions
+    w._handle_msg({'content': {'data': {'method': 'request_state'}}})
+    assert 'versions' not in w.comm.messages[-1][1]['data']
+    w._handle_msg({'content': {'data': {'method': 'update', 'state': {'a': False},
+                                        'versions': {'a': 0}}}, 'buffers': []})
+    assert w.a is False
+    # the versions start over
+    w.c = [True]
+    assert w.comm.messages[-1][1]['data']['versions'] == {'c': 1}
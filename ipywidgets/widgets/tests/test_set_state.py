@@ -94,7 +94,8 @@ def test_set_state_transformer():
         data=dict(
             buffer_paths=[],
             method='update',
-            state=dict(d=[False, True, False])
+            state=dict(d=[False, True, False]),
+            versions=dict(d=1),
         )))]
 
 
@@ -124,7 +125,8 @@ def test_set_state_data_truncate():
         data=dict(
             buffer_paths=[['d', 'data']],
             method='update',
-            state=dict(d={})
+            state=dict(d={}),
+            versions=dict(d=1),
         )))
 
     # Sanity:
@@ -237,11 +239,44 @@ def test_property_lock():
     assert widget.value == 42
 
     # we expect first the {'value': 2.0} state to be send, followed by the {'value': 42.0} state
-    msg = {'method': 'update', 'state': {'value': 2.0}, 'buffer_paths': []}
+    msg = {'method': 'update', 'state': {'value': 2.0}, 'buffer_paths': [], 'versions': {'value': 2}}
     call2 = mock.call(msg, buffers=[])
 
-    msg = {'method': 'update', 'state': {'value': 42.0}, 'buffer_paths': []}
+    msg = {'method': 'update', 'state': {'value': 42.0}, 'buffer_paths': [], 'versions': {'value': 3}}
     call42 = mock.call(msg, buffers=[])
 
     calls = [call2, call42]
     widget._send.assert_has_calls(calls)
+
+
+def _update_msg(state, versions):
+    return {'content': {'data': {'method': 'update', 'state': state, 'versions': versions}},
+            'buffers': []}
+
+def test_stale_update_is_dropped():
+    w = NumberWidget()
+    w.i = 5
+    assert w.comm.messages[-1][1]['data']['versions'] == {'i': 1}
+    w.comm.messages.clear()
+    # the front-end changed i and f before it received version 1 of i
+    w._handle_msg(_update_msg({'i': 3, 'f': 1.5}, {'i': 0, 'f': 0}))
+    assert w.i == 5
+    assert w.f == 1.5
+    # a change made after receiving the latest version is accepted
+    w._handle_msg(_update_msg({'i': 4}, {'i': 1}))
+    assert w.i == 4
+    assert w.comm.messages == []
+
+
+def test_nested_property_lock():
+    class NestedWidget(SimpleWidget):
+        @observe('a')
+        def _a_changed(self, change):
+            # e.g. an observer applying state from the front-end
+            self.set_state({'b': [True, True, True]})
+
+    w = NestedWidget()
+    w.set_state({'a': True, 'c': [True]})
+    assert w.b == (True, True, True)
+    assert w.c == [True]
+    assert w.comm.messages == []
@@ -11,8 +11,8 @@ from unittest import TestCase
 from traitlets import HasTraits, Int, TraitError
 from traitlets.tests.test_traitlets import TraitTestBase
 
-from ipywidgets import Color, NumberFormat
-from ipywidgets.widgets.widget import _remove_buffers, _put_buffers
+from ipywidgets import Color, NDArray, NumberFormat, array_serialization
+from ipywidgets.widgets.widget import _remove_buffers, _put_buffers, _json_equal, _BufferDigests
 from ipywidgets.widgets.trait_types import date_serialization, TypedTuple
 
 
@@ -168,6 +168,44 @@ class TestBuffers(TestCase):
         self.assertEqual(state_before, state)
 
 
+class TestJsonEqual(TestCase):
+    def test_plain(self):
+        self.assertTrue(_json_equal({'a': (1, 2), 'b': [{'c': 'd'}]},
+                                    {'a': [1, 2], 'b': [{'c': 'd'}]}))
+        self.assertTrue(_json_equal(1.0, 1))
+        self.assertTrue(_json_equal({1: 'x'}, {'1': 'x'}))
+        self.assertFalse(_json_equal([1, 2], [1, 2, 3]))
+        self.assertFalse(_json_equal({'a': 1}, {'b': 1}))
+        self.assertFalse(_json_equal({'a': [1]}, {'a': 1}))
+        self.assertFalse(_json_equal('1', 1))
+        self.assertFalse(_json_equal(None, []))
+
+    def test_buffers(self):
+        self.assertTrue(_json_equal({'x': [b'ab', 1]}, {'x': [memoryview(b'ab'), 1]}))
+        self.assertTrue(_json_equal(memoryview(array.array('f', [1.5])),
+                                    memoryview(array.array('f', [1.5]).tobytes())))
+        self.assertFalse(_json_equal({'x': b'ab'}, {'x': b'ac'}))
+        self.assertFalse(_json_equal({'x': b'ab'}, {'x': None}))
+        self.assertFalse(_json_equal({'x': 'ab'}, {'x': b'ab'}))
+
+    def test_buffer_digests(self):
+        digests = _BufferDigests(maxsize=2, min_size=2)
+        a, b, c = b'abc', bytes(b'abc'[:]), memoryview(b'abd')
+        self.assertTrue(_json_equal({'x': a}, {'x': b}, digests))
+        self.assertFalse(_json_equal({'x': a}, {'x': c}, digests))
+        self.assertEqual(digests.get(a), digests.get(memoryview(b'abc')))
+        # writable and small buffers are not digested
+        self.assertIsNone(digests.get(bytearray(b'abc')))
+        self.assertIsNone(digests.get(b'a'))
+        self.assertTrue(_json_equal(bytearray(b'abc'), a, digests))
+        # the least recently used digests are dropped
+        self.assertEqual(len(digests._digests), 2)
+        digests.invalidate(a)
+        self.assertEqual(len(digests._digests), 1)
+        digests.clear()
+        self.assertEqual(len(digests._digests), 0)
+
+
 
 def test_typed_tuple_uninitialized_ints():
     class TestCase(HasTraits):
@@ -243,3 +281,38 @@ def test_typed_tuple_positional_default():
 
     obj = TestCase()
     assert obj.value == (1, 2, 3)
+
+
+def test_ndarray_validation():
+    np = pytest.importorskip('numpy')
+    class TestCase(HasTraits):
+        value = NDArray(dtype='float32', shape=(None, 2))
+
+    obj = TestCase()
+    assert obj.value.shape == (0, 2)
+    assert obj.value.dtype == np.float32
+    obj.value = np.ones((3, 2), dtype='float32')
+    for bad in [[1.0, 2.0], np.ones((3, 2)), np.ones((2, 3), dtype='float32'),
+                np.ones(2, dtype='float32')]:
+        with pytest.raises(TraitError):
+            obj.value = bad
+
+
+def test_ndarray_serialization():
+    np = pytest.importorskip('numpy')
+    value = np.arange(6, dtype='int16').reshape(2, 3)
+    js = array_serialization['to_json'](value, None)
+    assert js['dtype'] == 'int16'
+    assert js['shape'] == [2, 3]
+    assert np.shares_memory(np.asarray(js['buffer']), value)
+
+    state = {'value': js}
+    state_without_buffers, buffer_paths, buffers = _remove_buffers(state)
+    assert buffer_paths == [['value', 'buffer']]
+    received = [memoryview(b) for b in buffers]
+    _put_buffers(state_without_buffers, buffer_paths, received)
+    array = array_serialization['from_json'](state_without_buffers['value'], None)
+    assert np.array_equal(array, value)
+    assert np.shares_memory(array, value)
+    assert array_serialization['to_json'](None, None) is None
+    assert array_serialization['from_json'](None, None) is None
@@ -3,12 +3,28 @@
 
 """Test Widget."""
 
+import asyncio
+import gc
+import weakref
+
+import pytest
+
 from IPython.core.interactiveshell import InteractiveShell
 from IPython.display import display
 from IPython.utils.capture import capture_output
+from traitlets import Unicode
+
+from ..._version import __protocol_version__
+
+from .utils import DummyComm
 
-from ..widget import Widget
-from ..widget_button import Button
+from .. import widget as widget_module
+from ..widget import Widget, WidgetRegistry, widget_serialization, _version_matches
+from ..widget_layout import Layout
+from ..widget_box import Box
+from ..widget_button import Button, ButtonStyle
+from ..widget_int import IntSlider
+from ..widget_link import jslink
 
 
 def test_no_widget_view():
@@ -43,3 +59,304 @@ def test_widget_view():
     assert 'application/vnd.jupyter.widget-view+json' in mime_bundle, "widget should have have a view"
     assert cap.stdout == '', repr(cap.stdout)
     assert cap.stderr == '', repr(cap.stderr)
+
+
+def test_sync_table():
+    # computed when the class is registered
+    table = Button.__dict__['_sync_table']
+    assert Button._get_sync_table() is table
+    assert set(table) == set(Button.class_traits(sync=True))
+    assert table['layout'].to_json is widget_serialization['to_json']
+    assert table['description'].to_json is Widget._trait_to_json
+    with pytest.raises(TypeError):
+        table['description'] = None
+    # subclasses get their own table
+    class MyButton(Button):
+        extra = Unicode().tag(sync=True)
+    assert 'extra' in MyButton._get_sync_table()
+    assert 'extra' not in Button._get_sync_table()
+    # traits added to an instance are included
+    w = Button()
+    w.add_traits(added=Unicode().tag(sync=True))
+    assert 'added' in w._get_sync_table()
+    assert 'added' not in Button._get_sync_table()
+
+
+def test_lazy_open():
+    w = Button(lazy_open=True)
+    assert w.comm is None
+    w.description = 'changed'
+    assert w.comm is None
+    # the comm is opened when the model id is needed
+    model_id = w.model_id
+    assert w.comm is not None
+    assert Widget.widgets[model_id] is w
+
+
+def test_lazy_open_child(monkeypatch):
+    monkeypatch.setattr(Button, 'lazy_open', True)
+    child = Button()
+    assert child.comm is None
+    # referencing a widget in the state of an open widget opens it
+    box = Box([child])
+    assert child.comm is not None
+    assert box.get_state()['children'] == ['IPY_MODEL_' + child.model_id]
+    assert Button(lazy_open=False).comm is not None
+
+
+def test_lazy_open_closed():
+    w = Button(lazy_open=True)
+    w.close()
+    # closed widgets are not opened
+    with pytest.raises(AttributeError):
+        w.model_id
+    assert w.comm is None
+
+
+def test_lazy_open_display():
+    shell = InteractiveShell.instance()
+    w = Button(lazy_open=True)
+    with capture_output() as cap:
+        display(w)
+    assert w.comm is not None
+    view = cap.outputs[0].data['application/vnd.jupyter.widget-view+json']
+    assert view['model_id'] == w.model_id
+
+
+class DummyCommManager:
+    def __init__(self):
+        self.comms = []
+
+    def register_comm(self, comm):
+        self.comms.append(comm)
+
+
+class DummyKernel:
+    def __init__(self):
+        self.comm_manager = DummyCommManager()
+
+
+def test_create_many(monkeypatch):
+    kernel = DummyKernel()
+    opened = []
+    class BatchComm(DummyComm):
+        def __init__(self, comm_id='a-b-c-d', **kwargs):
+            self.comm_id = comm_id
+            super().__init__(**kwargs)
+
+        def open(self, *args, **kwargs):
+            opened.append((self, kwargs))
+    BatchComm.kernel = kernel
+    monkeypatch.setattr(widget_module, 'Comm', BatchComm)
+
+    w1, w2, w3 = Button.create_many([
+        {'model_id': 'w1', 'description': 'one', 'layout': Layout(lazy_open=True)},
+        {'model_id': 'w2', 'description': 'two'},
+        {'model_id': 'w3', 'description': 'three'}])
+    assert [w1.model_id, w2.model_id, w3.model_id] == ['w1', 'w2', 'w3']
+    assert all(Widget.widgets[w.model_id] is w for w in [w1, w2, w3])
+    assert kernel.comm_manager.comms == [w2.comm, w3.comm]
+    opened = {comm.comm_id: kwargs for comm, kwargs in opened}
+    assert 'w2' not in opened and 'w3' not in opened
+    # the lazily opened layout referenced by the state is opened too
+    assert w1.layout.comm is not None
+    kwargs = opened['w1']
+    data = kwargs['data']
+    assert data['state']['description'] == 'one'
+    assert sorted(data['batch_open']['states']) == ['w2', 'w3']
+    assert data['batch_open']['states']['w3']['state']['description'] == 'three'
+    assert kwargs['metadata']['version'] == __protocol_version__
+
+
+def test_shared_default_layout():
+    b1 = Button()
+    b2 = Button()
+    assert b1.layout is not b2.layout
+    shared = Layout._get_shared_default()
+    assert b1.get_state()['layout'] == 'IPY_MODEL_' + shared.model_id
+    assert b2.get_state()['layout'] == 'IPY_MODEL_' + shared.model_id
+    assert b1.layout.comm is None
+    # the layout is copied on write
+    b1.layout.width = '10px'
+    assert b1.layout.comm is not None
+    assert b1.layout.model_id != shared.model_id
+    assert b1.get_state()['layout'] == 'IPY_MODEL_' + b1.layout.model_id
+    assert b2.get_state()['layout'] == 'IPY_MODEL_' + shared.model_id
+    assert shared.width is None
+    # explicit layouts are not shared
+    b3 = Button(layout={'width': '20px'})
+    assert b3.layout.model_id != shared.model_id
+
+
+def test_shared_default_style():
+    b1 = Button()
+    b2 = Button()
+    shared = ButtonStyle._get_shared_default()
+    assert b1.get_state()['style'] == 'IPY_MODEL_' + shared.model_id
+    assert b2.get_state()['style'] == 'IPY_MODEL_' + shared.model_id
+    # styles of a different class get their own shared model
+    s = IntSlider()
+    assert s.get_state()['style'] != b1.get_state()['style']
+    b1.style.button_color = 'red'
+    assert b1.style.model_id != shared.model_id
+    assert b2.style.button_color is None
+    # an explicit style instance can be shared by many widgets
+    style = ButtonStyle(font_weight='bold')
+    b3 = Button(style=style)
+    b4 = Button(style=style)
+    assert b3.get_state()['style'] == b4.get_state()['style']
+
+
+def test_shared_default_nested_reference():
+    a = Button()
+    b = Button()
+    shared = Layout._get_shared_default()
+    link = jslink((a.layout, 'width'), (b.layout, 'width'))
+    # default layouts referenced from within a container get their own model,
+    # so that the link does not change the layouts of all widgets
+    state = link.get_state()
+    assert state['source'][0] == 'IPY_MODEL_' + a.layout.model_id
+    assert state['target'][0] == 'IPY_MODEL_' + b.layout.model_id
+    assert a.layout.model_id != shared.model_id
+    assert b.layout.model_id != shared.model_id
+    assert a.get_state()['layout'] == 'IPY_MODEL_' + a.layout.model_id
+    a.layout.width = '10px'
+    assert link.get_state()['source'][0] == 'IPY_MODEL_' + a.layout.model_id
+
+
+def test_shared_default_layout_update(monkeypatch):
+    monkeypatch.setattr(widget_module, 'Comm', DummyComm)
+    b = Button()
+    b.comm.messages.clear()
+    b.layout.width = '10px'
+    # the owner sends the reference to the layout once it has its own model
+    (args, kwargs), = b.comm.messages
+    assert kwargs['data']['state'] == {'layout': 'IPY_MODEL_' + b.layout.model_id}
+
+
+def test_weak_registry(monkeypatch):
+    closed = []
+    class ClosingComm(DummyComm):
+        def __init__(self, comm_id='a-b-c-d', **kwargs):
+            self.comm_id = comm_id
+            super().__init__(**kwargs)
+
+        def close(self, *args, **kwargs):
+            # comms also close themselves when they are garbage collected
+            if self.comm_id not in closed:
+                closed.append(self.comm_id)
+    monkeypatch.setattr(widget_module, 'Comm', ClosingComm)
+    callbacks = []
+    class Loop:
+        def add_callback(self, callback, *args, **kwargs):
+            callbacks.append(callback)
+    monkeypatch.setattr(widget_module, '_get_event_loop', lambda: Loop())
+
+    Widget.set_weak_registry()
+    try:
+        w1 = Widget(model_id='weak1')
+        w2 = Widget(model_id='weak2')
+        w2._repr_mimebundle_()
+        handler = w1.comm._msg_callback
+        assert Widget.widgets['weak1'] is w1
+        del w1, w2
+        gc.collect()
+        # the displayed widget is kept alive
+        assert 'weak1' not in Widget.widgets
+        assert 'weak2' in Widget.widgets
+        # the comm is closed at the end of the event loop iteration
+        assert closed == []
+        callback, = callbacks
+        callback()
+        assert closed == ['weak1']
+        # messages for the collected widget are ignored
+        handler({'content': {'data': {'method': 'request_state'}}})
+    finally:
+        Widget.set_weak_registry(False)
+    w2 = Widget.widgets['weak2']
+    assert not isinstance(Widget.widgets, weakref.WeakValueDictionary)
+    w2.close()
+    assert closed == ['weak1', 'weak2']
+
+
+@pytest.mark.parametrize('version, version_range, expected', [
+    ('1.5.0', '1.5.0', True),
+    ('1.5.1', '1.5.0', False),
+    ('1.5.1', '1.5', True),
+    ('1.6.0', '1.x', True),
+    ('3.0.0', '*', True),
+    ('1.2.3', '^1.0.0', True),
+    ('2.0.0', '^1.0.0', False),
+    ('2.0.0-rc.1', '^1.0.0', False),
+    ('0.2.5', '^0.2.1', True),
+    ('0.3.0', '^0.2.1', False),
+    ('1.2.9', '~1.2.3', True),
+    ('1.3.0', '~1.2.3', False),
+    ('2.5.0', '>=1 <3', True),
+    ('3.0.0', '>=1 <3', False),
+    ('4.1.0', '>=1 <3 || 4.x', True),
+    ('2.0.9', '1.0 - 2.0', True),
+    ('2.1.0', '1.0 - 2.0', False),
+    ('1.2.9', '>1.2', False),
+    ('1.2.0', '<=1.2', True),
+    ('invalid', '*', False),
+])
+def test_version_matches(version, version_range, expected):
+    assert _version_matches(version, version_range) == expected
+
+
+def test_widget_registry_versions():
+    registry = WidgetRegistry()
+    class One: pass
+    class Two: pass
+    registry.register('m', '^1.0.0', 'M', 'v', '^1.0.0', 'V', One)
+    registry.register('m', '^2.0.0', 'M', 'v', '^2.0.0', 'V', Two)
+    assert registry.get('m', '1.3.0', 'M', 'v', '1.1.0', 'V') is One
+    assert registry.get('m', '2.1.0', 'M', 'v', '2.0.0', 'V') is Two
+    # unmatched versions fall back to the first registered ranges
+    assert registry.get('m', '3.0.0', 'M', 'v', '3.0.0', 'V') is One
+    with pytest.raises(KeyError):
+        registry.get('m', '1.0.0', 'Other', 'v', '1.0.0', 'V')
+    # registering invalidates the resolved classes
+    class Three: pass
+    registry.register('m', '3.x', 'M', 'v', '3.x', 'V', Three)
+    assert registry.get('m', '3.0.0', 'M', 'v', '3.0.0', 'V') is Three
+    assert len(list(registry.items())) == 3
+
+
+def test_coroutine_callbacks():
+    clicked = []
+    async def on_click(button):
+        await asyncio.sleep(0)
+        clicked.append(button)
+    async def failing(button):
+        raise ValueError('failing callback')
+
+    b = Button()
+    b.on_click(on_click)
+    b.on_click(failing)
+    # without a running event loop, the coroutine runs to completion
+    b.click()
+    assert clicked == [b]
+
+    async def main():
+        b.click()
+        # the coroutine is scheduled on the running loop
+        assert clicked == [b]
+        await asyncio.sleep(0.01)
+        assert clicked == [b, b]
+    asyncio.run(main())
+
+
+def test_coroutine_observer():
+    changes = []
+    async def observer(change):
+        changes.append(change['new'])
+
+    b = Button()
+    b.observe(observer, 'description')
+    b.description = 'one'
+    assert changes == ['one']
+    b.unobserve(observer, 'description')
+    b.description = 'two'
+    assert changes == ['one']
@@ -221,3 +221,8 @@ def test_append_display_data():
         },
     )
     assert widget.outputs == expected, repr(widget.outputs)
+
+
+def test_outputs_sent_in_full():
+    # the frontend changes outputs too, so splices could be misapplied
+    assert not widget_output.Output._get_sync_table()['outputs'].delta
@@ -31,6 +31,8 @@ def setup_test_comm():
     def raise_not_implemented(*args, **kwargs):
         raise NotImplementedError()
     Widget._repr_mimebundle_ = raise_not_implemented
+    # the codec accepted by the front-end is shared by all the widgets
+    _widget_attrs['_codec'] = Widget._codec
 
 def teardown_test_comm():
     for attr, value in _widget_attrs.items():
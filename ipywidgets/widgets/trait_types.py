@@ -175,6 +175,71 @@ class CByteMemoryView(ByteMemoryView):
         except Exception:
             self.error(obj, value)
 
+class NDArray(traitlets.TraitType):
+    """A trait for numpy arrays, with optional dtype and shape validation.
+
+    ``shape`` is a tuple of dimension sizes, where ``None`` matches any size.
+    Use with ``array_serialization`` to sync the array data as a binary
+    buffer. numpy is only imported when the trait is used.
+    """
+
+    info_text = 'a numpy array'
+
+    def __init__(self, default_value=traitlets.Undefined, dtype=None, shape=None, **kwargs):
+        self.dtype = dtype
+        self.shape = None if shape is None else tuple(shape)
+        super().__init__(default_value=default_value, **kwargs)
+
+    def make_dynamic_default(self):
+        import numpy as np
+        shape = () if self.shape is None else tuple(n or 0 for n in self.shape)
+        return np.zeros(shape, dtype=self.dtype)
+
+    def validate(self, obj, value):
+        import numpy as np
+        if not isinstance(value, np.ndarray):
+            self.error(obj, value)
+        if self.dtype is not None and value.dtype != np.dtype(self.dtype):
+            raise traitlets.TraitError(
+                'The dtype of the %r trait of %s must be %s, but an array of '
+                'dtype %s was specified.' % (
+                    self.name, type(obj).__name__, np.dtype(self.dtype), value.dtype))
+        if self.shape is not None and (
+                value.ndim != len(self.shape) or
+                any(n is not None and n != m for n, m in zip(self.shape, value.shape))):
+            raise traitlets.TraitError(
+                'The shape of the %r trait of %s must match %r, but an array of '
+                'shape %r was specified.' % (
+                    self.name, type(obj).__name__, self.shape, value.shape))
+        return value
+
+    def default_value_repr(self):
+        return 'array(dtype=%r, shape=%r)' % (self.dtype, self.shape)
+
+def array_to_json(value, obj):
+    if value is None:
+        return None
+    import numpy as np
+    # Only copies the data if the array is not contiguous
+    value = np.ascontiguousarray(value)
+    return {
+        'dtype': str(value.dtype),
+        'shape': list(value.shape),
+        'buffer': memoryview(value)
+    }
+
+def array_from_json(js, obj):
+    if js is None:
+        return None
+    import numpy as np
+    # The array is a read-only view of the received buffer
+    return np.frombuffer(js['buffer'], dtype=js['dtype']).reshape(js['shape'])
+
+array_serialization = {
+    'from_json': array_from_json,
+    'to_json': array_to_json
+}
+
 class InstanceDict(traitlets.Instance):
     """An instance trait which coerces a dict to an instance.
 
@@ -182,7 +247,12 @@ class InstanceDict(traitlets.Instance):
     to initialize the instance.
 
     Also, we default to a trivial instance, even if args and kwargs
-    is not specified."""
+    is not specified. With shared_default=True, the default instances of a
+    widget class share a single model until they are modified."""
+
+    def __init__(self, *args, shared_default=False, **kwargs):
+        self.shared_default = shared_default
+        super().__init__(*args, **kwargs)
 
     def validate(self, obj, value):
         if isinstance(value, dict):
@@ -191,6 +261,8 @@ class InstanceDict(traitlets.Instance):
             return super().validate(obj, value)
 
     def make_dynamic_default(self):
+        if self.shared_default and not self.default_args and not self.default_kwargs:
+            return self.klass._new_shared_default()
         return self.klass(*(self.default_args or ()),
                           **(self.default_kwargs or {}))
 
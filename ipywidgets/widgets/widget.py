@@ -6,13 +6,25 @@
 in the Jupyter notebook front-end.
 """
 
-from contextlib import contextmanager
+import re
+import time
+import asyncio
+import inspect
+import threading
+import zlib
+import operator
+import hashlib
+import weakref
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from collections import namedtuple, deque, OrderedDict, Counter, defaultdict
 from collections.abc import Iterable
+from types import MappingProxyType
 from IPython import get_ipython
 from ipykernel.comm import Comm
 from traitlets import (
-    HasTraits, Unicode, Dict, Instance, List, Int, Set, Bytes, observe, default, Container,
-    Undefined)
+    All, HasTraits, Unicode, Dict, Instance, List, Int, Float, Bool, Enum, Set, Bytes, Tuple, observe,
+    default, Container, Undefined)
 from json import loads as jsonloads, dumps as jsondumps
 
 from base64 import standard_b64encode
@@ -22,14 +34,26 @@ PROTOCOL_VERSION_MAJOR = __protocol_version__.split('.')[0]
 
 def _widget_to_json(x, obj):
     if isinstance(x, dict):
-        return {k: _widget_to_json(v, obj) for k, v in x.items()}
+        return {k: _nested_widget_to_json(v, obj) for k, v in x.items()}
     elif isinstance(x, (list, tuple)):
-        return [_widget_to_json(v, obj) for v in x]
+        return [_nested_widget_to_json(v, obj) for v in x]
     elif isinstance(x, Widget):
+        if x._shared_default and obj is not None:
+            x._shared_owners.add(obj)
         return "IPY_MODEL_" + x.model_id
     else:
         return x
 
+def _nested_widget_to_json(x, obj):
+    """Serialize a value nested in a container.
+
+    The owners of a copy-on-write default widget only send again the keys
+    holding the widget itself when it is opened, so a default widget nested
+    in a container is opened with its own model right away."""
+    if isinstance(x, Widget) and x._shared_default:
+        x.open()
+    return _widget_to_json(x, obj)
+
 def _json_to_widget(x, obj):
     if isinstance(x, dict):
         return {k: _json_to_widget(v, obj) for k, v in x.items()}
@@ -47,6 +71,42 @@ widget_serialization = {
 
 _binary_types = (memoryview, bytearray, bytes)
 
+# trait types whose values never contain binary buffers
+_non_binary_trait_types = (Unicode, Bool, Int, Float, Enum)
+
+def _trait_may_contain_buffers(trait, to_json=None):
+    """Whether the serialized value of a trait may contain binary buffers.
+
+    This can be declared with the ``buffers`` metadata of the trait. Otherwise
+    it is derived from the trait type for traits with the default serializer
+    or the widget serializer: unicode, bool, numeric and enum traits,
+    references to widgets and containers of those never contain buffers.
+    """
+    buffers = trait.metadata.get('buffers')
+    if buffers is not None:
+        return bool(buffers)
+    if to_json is None:
+        to_json = trait.metadata.get('to_json')
+    if to_json is not None and to_json is not _widget_to_json:
+        return True
+    if isinstance(trait, _non_binary_trait_types):
+        return False
+    if isinstance(trait, Tuple):
+        traits = trait._traits
+        return not traits or any(_trait_may_contain_buffers(t, to_json) for t in traits)
+    if isinstance(trait, Container):
+        return trait._trait is None or _trait_may_contain_buffers(trait._trait, to_json)
+    if isinstance(trait, Dict):
+        # traitlets 4 names these _trait and _traits
+        value_trait = getattr(trait, '_value_trait', None) or getattr(trait, '_trait', None)
+        per_key_traits = getattr(trait, '_per_key_traits', None) or getattr(trait, '_traits', None)
+        return (value_trait is None or bool(per_key_traits)
+                or _trait_may_contain_buffers(value_trait, to_json))
+    if isinstance(trait, Instance):
+        return not (to_json is _widget_to_json and isinstance(trait.klass, type)
+                    and issubclass(trait.klass, Widget))
+    return True
+
 def _put_buffers(state, buffer_paths, buffers):
     """The inverse of _remove_buffers, except here we modify the existing dict/lists.
     Modifying should be fine, since this is used when state comes from the wire.
@@ -119,11 +179,72 @@ def _remove_buffers(state):
     state = _separate_buffers(state, [], buffer_paths, buffers)
     return state, buffer_paths, buffers
 
-def _buffer_list_equal(a, b):
+def _json_key(key):
+    """Return the string a non-string dict key is converted to in JSON."""
+    return next(iter(jsonloads(jsondumps({key: None}))))
+
+def _json_equal(a, b, digests=None):
+    """Compare two serialized values as they would compare after a round-trip
+    through JSON, e.g. tuples and lists are equivalent. Binary buffers are
+    compared by their bytes, or by their cached digests when a
+    _BufferDigests cache is given.
+
+    The comparison stops at the first difference.
+    """
+    if a is b:
+        return True
+    if isinstance(a, _binary_types) or isinstance(b, _binary_types):
+        return (isinstance(a, _binary_types) and isinstance(b, _binary_types)
+                and _buffer_list_equal([a], [b], digests))
+    if isinstance(a, (list, tuple)):
+        if not isinstance(b, (list, tuple)) or len(a) != len(b):
+            return False
+        for x, y in zip(a, b):
+            if not _json_equal(x, y, digests):
+                return False
+        return True
+    if isinstance(a, dict):
+        if not isinstance(b, dict) or len(a) != len(b):
+            return False
+        for k, v in a.items():
+            if not isinstance(k, str):
+                k = _json_key(k)
+            if k not in b or not _json_equal(v, b[k], digests):
+                return False
+        return True
+    if isinstance(b, (list, tuple, dict)):
+        return False
+    return a == b
+
+def _compute_splice(old, new):
+    """Return a splice [start, delete_count, items] that turns the sequence
+    old into the sequence new, or None if they are equal.
+
+    The splice replaces the range between the common prefix and the common
+    suffix of both sequences, so appending, inserting or removing a
+    contiguous range of items results in a splice of the size of that range.
+    """
+    n_old, n_new = len(old), len(new)
+    limit = min(n_old, n_new)
+    start = 0
+    while start < limit and (old[start] is new[start] or old[start] == new[start]):
+        start += 1
+    if start == n_old == n_new:
+        return None
+    limit -= start
+    end = 0
+    while end < limit and (old[n_old - 1 - end] is new[n_new - 1 - end]
+                           or old[n_old - 1 - end] == new[n_new - 1 - end]):
+        end += 1
+    return [start, n_old - start - end, list(new[start:n_new - end])]
+
+def _buffer_list_equal(a, b, digests=None):
     """Compare two lists of buffers for equality.
 
     Used to decide whether two sequences of buffers (memoryviews,
     bytearrays, or python 3 bytes) differ, such that a sync is needed.
+    If a _BufferDigests cache is given, buffers with a cached digest are
+    compared by digest.
 
     Returns True if equal, False if unequal
     """
@@ -132,6 +253,13 @@ def _buffer_list_equal(a, b):
     if a == b:
         return True
     for ia, ib in zip(a, b):
+        if digests is not None:
+            da = digests.get(ia)
+            db = digests.get(ib) if da is not None else None
+            if db is not None:
+                if da != db:
+                    return False
+                continue
         # Check byte equality, since bytes are what is actually synced
         # NOTE: Simple ia != ib does not always work as intended, as
         # e.g. memoryview(np.frombuffer(ia, dtype='float32')) !=
@@ -142,6 +270,234 @@ def _buffer_list_equal(a, b):
     return True
 
 
+class _BufferDigests:
+    """An LRU cache of the digests of binary buffers, keyed on the identity of
+    the buffers.
+
+    Only read-only buffers of at least min_size bytes are digested, since
+    the contents of writable buffers may change. The cache holds references
+    to the buffers, so that their ids are not reused while cached. Use
+    invalidate or clear to drop digests.
+    """
+
+    def __init__(self, maxsize=64, min_size=65536):
+        self.maxsize = maxsize
+        self.min_size = min_size
+        self._digests = OrderedDict()
+
+    def get(self, buffer):
+        """Return the digest of a buffer, or None if it is not digested."""
+        entry = self._digests.get(id(buffer))
+        if entry is not None and entry[0] is buffer:
+            self._digests.move_to_end(id(buffer))
+            return entry[1]
+        view = memoryview(buffer)
+        if not view.readonly or view.nbytes < self.min_size:
+            return None
+        digest = hashlib.blake2b(view.cast('B'), digest_size=32).digest()
+        self._digests[id(buffer)] = (buffer, digest)
+        if len(self._digests) > self.maxsize:
+            self._digests.popitem(last=False)
+        return digest
+
+    def invalidate(self, buffer):
+        """Drop the digest of a buffer."""
+        self._digests.pop(id(buffer), None)
+
+    def clear(self):
+        """Drop all digests."""
+        self._digests.clear()
+
+_buffer_digests = _BufferDigests()
+
+class _BufferStore:
+    """The kernel side of the content-addressed buffer store of the front-end.
+
+    The front-end keeps the buffers sent to it in an LRU store of capacity
+    entries, keyed on the hash of their contents. This mirrors the hashes in
+    that store, applying the same operations in the same order, so that
+    buffers already in the store are sent as references to their hash
+    instead of their bytes. The capacity is 0, i.e. the store is disabled,
+    until it is negotiated with the front-end.
+    """
+
+    def __init__(self, min_size=4096):
+        self.min_size = min_size
+        self.capacity = 0
+        self._hashes = OrderedDict()
+        self._reset = False
+
+    def negotiate(self, capacity):
+        """Set the capacity to the smaller of the capacities of both sides."""
+        self.capacity = max(min(Widget.buffer_store_size, capacity), 0)
+        self._evict()
+
+    def reset(self):
+        """Forget the contents of the store, which the front-end is told to
+        drop with the next stored buffers."""
+        self._hashes.clear()
+        self._reset = True
+
+    def _evict(self):
+        while len(self._hashes) > self.capacity:
+            self._hashes.popitem(last=False)
+
+    def store_buffers(self, buffers, digests=None):
+        """Return the buffers of a message with the buffers known to the
+        front-end replaced by empty buffers, and the store entry of the message
+        (None if no buffer is stored).
+
+        The entries of the store entry are [index, hash, operation] lists, in
+        the order they are applied, where the operation is 'put' for buffers
+        sent to be stored, and 'ref' for references to stored buffers. The
+        hashes are looked up in the digests cache if given, see
+        Widget.digest_buffers."""
+        entries = []
+        buffers = list(buffers)
+        for i, buffer in enumerate(buffers):
+            view = memoryview(buffer)
+            if view.nbytes < self.min_size:
+                continue
+            digest = ((digests and digests.get(buffer)) or
+                      hashlib.blake2b(view.cast('B'), digest_size=32).digest()).hex()
+            if digest in self._hashes:
+                self._hashes.move_to_end(digest)
+                buffers[i] = b''
+                entries.append([i, digest, 'ref'])
+            else:
+                self._hashes[digest] = None
+                self._evict()
+                entries.append([i, digest, 'put'])
+        if not entries:
+            return buffers, None
+        store = {'capacity': self.capacity, 'entries': entries}
+        if self._reset:
+            store['reset'] = True
+            self._reset = False
+        return buffers, store
+
+
+def _json_size(x):
+    """Return the size in bytes of the compact JSON of x, or 0 if x is not
+    JSON serializable."""
+    try:
+        return len(jsondumps(x, separators=(',', ':')).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _json_size_exceeds(x, limit):
+    """Return whether the JSON of x is larger than limit bytes, as estimated
+    from a lower bound of its size, without serializing it.
+
+    The walk stops as soon as the limit is exceeded, so that it is cheap for
+    both small and large values."""
+    size = 0
+    stack = [x]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            size += len(value) + 2
+        elif isinstance(value, dict):
+            size += 2
+            for k, v in value.items():
+                size += len(k) + 4 if isinstance(k, str) else 4
+                stack.append(v)
+        elif isinstance(value, (list, tuple)):
+            size += 2 + len(value)
+            stack.extend(value)
+        else:
+            size += 1
+        if size > limit:
+            return True
+    return False
+
+
+# Size of the sample of a buffer which is compressed to tell whether the
+# buffer is worth compressing, and the ratio above which it is not.
+_COMPRESSION_SAMPLE_SIZE = 4096
+_INCOMPRESSIBLE_RATIO = 0.9
+
+
+def _looks_incompressible(buffer, compress):
+    """Return whether a buffer looks already compressed, e.g. a PNG image or
+    a video, from the compression of a sample taken in its middle."""
+    view = memoryview(buffer).cast('B')
+    if view.nbytes <= 2 * _COMPRESSION_SAMPLE_SIZE:
+        return False
+    start = (view.nbytes - _COMPRESSION_SAMPLE_SIZE) // 2
+    sample = view[start:start + _COMPRESSION_SAMPLE_SIZE]
+    return len(compress(sample)) > _INCOMPRESSIBLE_RATIO * _COMPRESSION_SAMPLE_SIZE
+
+
+class _SyncStats:
+    """Counters and timers of the synchronization of the widgets with the
+    front-end, aggregated per widget class and per trait, see
+    Widget.sync_stats.
+    """
+
+    def __init__(self):
+        # class name -> Counter
+        self.classes = defaultdict(Counter)
+        # (class name, trait name) -> Counter
+        self.traits = defaultdict(Counter)
+
+    def clear(self):
+        self.classes.clear()
+        self.traits.clear()
+
+    def count_message(self, widget, direction, data, buffers):
+        """Count a message of a widget, where direction is 'sent' or
+        'received'."""
+        counts = self.classes[type(widget).__name__]
+        counts['messages_' + direction] += 1
+        counts['json_bytes_' + direction] += _json_size(data)
+        counts['buffer_bytes_' + direction] += sum(memoryview(b).nbytes for b in buffers or ())
+
+    def count_state(self, widget, direction, state, buffer_paths, buffers):
+        """Count the traits of a state of a widget, without its buffers,
+        and the buffers removed from the state at buffer_paths."""
+        name = type(widget).__name__
+        for key, value in state.items():
+            counts = self.traits[name, key]
+            counts['updates_' + direction] += 1
+            counts['json_bytes_' + direction] += _json_size(value)
+        for path, buffer in zip(buffer_paths, buffers or ()):
+            self.traits[name, path[0]]['buffer_bytes_' + direction] += memoryview(buffer).nbytes
+
+    @contextmanager
+    def timer(self, widget, name, trait=None):
+        """Add the time spent in the block to the name_time timer of the
+        class of the widget, and of the trait if given."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            class_name = type(widget).__name__
+            self.classes[class_name][name + '_time'] += elapsed
+            if trait is not None:
+                self.traits[class_name, trait][name + '_time'] += elapsed
+
+_sync_stats = _SyncStats()
+
+
+# The sync metadata of a synced trait, see Widget._get_sync_table
+_SyncTrait = namedtuple('_SyncTrait', ['to_json', 'from_json', 'default_value', 'delta', 'buffers'])
+
+def _get_event_loop():
+    """Return the event loop of the running kernel, or None if there is none."""
+    kernel = getattr(get_ipython(), 'kernel', None)
+    return getattr(kernel, 'io_loop', None)
+
+def _get_other_thread_event_loop():
+    """Return the event loop of the running kernel when called from another
+    thread than the main thread, which runs the event loop, or None."""
+    if threading.current_thread() is threading.main_thread():
+        return None
+    return _get_event_loop()
+
+
 class LoggingHasTraits(HasTraits):
     """A parent class for HasTraits that log.
     Subclasses have a log trait, and the default behavior
@@ -154,16 +510,52 @@ class LoggingHasTraits(HasTraits):
         return log.get_logger()
 
 
+# the tasks of the coroutines scheduled by _schedule_coroutine, which the
+# event loop only references weakly
+_coroutine_tasks = set()
+
+def _schedule_coroutine(coro, log):
+    """Run a coroutine returned by a callback as a task of the running
+    asyncio event loop, which is the one of the kernel, or to completion if
+    no loop is running.
+
+    An exception raised by the coroutine is shown like the ones raised by
+    synchronous callbacks."""
+    async def run():
+        try:
+            await coro
+        except Exception as e:
+            ip = get_ipython()
+            if ip is None:
+                log.warning("Exception in coroutine %s: %s", coro, e, exc_info=True)
+            else:
+                ip.showtraceback()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(run())
+    else:
+        task = loop.create_task(run())
+        _coroutine_tasks.add(task)
+        task.add_done_callback(_coroutine_tasks.discard)
+
+
 class CallbackDispatcher(LoggingHasTraits):
     """A structure for registering and running callbacks"""
     callbacks = List()
 
     def __call__(self, *args, **kwargs):
-        """Call all of the registered callbacks."""
+        """Call all of the registered callbacks.
+
+        The coroutines returned by coroutine functions are scheduled with
+        _schedule_coroutine, and their results are not returned."""
         value = None
         for callback in self.callbacks:
             try:
                 local_value = callback(*args, **kwargs)
+                if asyncio.iscoroutine(local_value):
+                    _schedule_coroutine(local_value, self.log)
+                    local_value = None
             except Exception as e:
                 ip = get_ipython()
                 if ip is None:
@@ -180,7 +572,8 @@ class CallbackDispatcher(LoggingHasTraits):
         Parameters
         ----------
         callback: method handle
-            Method to be registered or unregistered.
+            Method to be registered or unregistered. It may be a coroutine
+            function, which is then run on the event loop of the kernel.
         remove=False: bool
             Whether to unregister the callback."""
 
@@ -190,6 +583,26 @@ class CallbackDispatcher(LoggingHasTraits):
         elif not remove and callback not in self.callbacks:
             self.callbacks.append(callback)
 
+class _CoroutineObserver:
+    """An observer scheduling the coroutine of a coroutine function handler,
+    which compares equal to the handler so that it can be unobserved."""
+
+    def __init__(self, handler, log):
+        self.handler = handler
+        self.log = log
+
+    def __eq__(self, other):
+        if isinstance(other, _CoroutineObserver):
+            other = other.handler
+        return self.handler == other
+
+    def __hash__(self):
+        return hash(self.handler)
+
+    def __call__(self, change):
+        _schedule_coroutine(self.handler(change), self.log)
+
+
 def _show_traceback(method):
     """decorator for showing tracebacks"""
     def m(self, *args, **kwargs):
@@ -204,13 +617,122 @@ def _show_traceback(method):
     return m
 
 
+def _weak_callback(method):
+    """Wrap a bound method in a callback which does not keep its object
+    alive. The callback does nothing once the object is garbage collected."""
+    ref = weakref.WeakMethod(method)
+    def callback(*args, **kwargs):
+        method = ref()
+        if method is not None:
+            return method(*args, **kwargs)
+    return callback
+
+
+_version_operators = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '=': operator.eq,
+}
+
+def _parse_version(version):
+    """Parse a version, which may be partial like '1', '1.2' or '1.x', into
+    the list of its numbers and its prerelease tag."""
+    version = version.strip().lstrip('v=').split('+')[0]
+    release, _, prerelease = version.partition('-')
+    parts = []
+    for part in release.split('.')[:3]:
+        if part in ('', 'x', 'X', '*'):
+            break
+        parts.append(int(part))
+    return parts, prerelease
+
+def _version_key(parts, prerelease=''):
+    """Get the sort key of a version, where prereleases sort before the
+    release."""
+    parts = list(parts) + [0] * (3 - len(parts))
+    return tuple(parts) + ((0, prerelease) if prerelease else (1, ''))
+
+def _lowest_key(parts):
+    """Get the sort key below the version and all its prereleases."""
+    return _version_key(parts)[:3] + (0, '')
+
+def _bump_key(parts, index):
+    """Get the sort key below the version with the number at index one more
+    than in parts, and all its prereleases."""
+    return _lowest_key(parts[:index] + [parts[index] + 1])
+
+@lru_cache(maxsize=None)
+def _parse_version_range(version_range):
+    """Parse a semver range like '^1.2.0', '~1.2', '>=1 <3 || 4.x' or
+    '1.0 - 2.0' into a list of comparator sets, each a list of (operator,
+    version key) pairs which all must hold."""
+    comparator_sets = []
+    for comparator_set in version_range.split('||'):
+        comparator_set = comparator_set.strip()
+        low, sep, high = comparator_set.partition(' - ')
+        if sep:
+            comparator_set = '>=%s <=%s' % (low.strip(), high.strip())
+        comparators = []
+        tokens = re.sub(r'([<>=~^]+)\s+', r'\1', comparator_set).split()
+        for token in tokens:
+            op, version = re.match(r'(\^|~>?|[<>]=?|=)?(.*)', token).groups()
+            parts, prerelease = _parse_version(version)
+            n = len(parts)
+            if n == 0:
+                if op in ('<', '>'):
+                    # nothing is below or above any version
+                    comparators.append(('<', _lowest_key([])))
+            elif op == '^':
+                comparators.append(('>=', _version_key(parts, prerelease)))
+                index = next((i for i, part in enumerate(parts) if part), n - 1)
+                comparators.append(('<', _bump_key(parts, index)))
+            elif op in ('~', '~>'):
+                comparators.append(('>=', _version_key(parts, prerelease)))
+                comparators.append(('<', _bump_key(parts, 1 if n > 1 else 0)))
+            elif n == 3:
+                comparators.append((op or '=', _version_key(parts, prerelease)))
+            elif op == '>':
+                comparators.append(('>=', _bump_key(parts, n - 1)))
+            elif op == '<':
+                comparators.append(('<', _lowest_key(parts)))
+            elif op == '<=':
+                comparators.append(('<', _bump_key(parts, n - 1)))
+            else:
+                comparators.append(('>=', _version_key(parts)))
+                if op != '>=':
+                    comparators.append(('<', _bump_key(parts, n - 1)))
+        comparator_sets.append(comparators)
+    return comparator_sets
+
+def _version_matches(version, version_range):
+    """Check whether a version satisfies a semver range.
+
+    Versions or ranges which cannot be parsed never match."""
+    try:
+        parts, prerelease = _parse_version(version)
+        comparator_sets = _parse_version_range(version_range)
+    except ValueError:
+        return False
+    if len(parts) < 3:
+        return False
+    key = _version_key(parts, prerelease)
+    return any(all(_version_operators[op](key, bound) for op, bound in comparators)
+               for comparators in comparator_sets)
+
+
 class WidgetRegistry:
 
     def __init__(self):
         self._registry = {}
+        # (model_module, model_name, view_module, view_name) ->
+        # {(model_module_version_range, view_module_version_range): klass}
+        self._index = {}
+        # the classes resolved by get, by the arguments of get
+        self._resolved = {}
 
     def register(self, model_module, model_module_version_range, model_name, view_module, view_module_version_range, view_name, klass):
         """Register a value"""
+        ranges = self._index.setdefault((model_module, model_name, view_module, view_name), {})
+        ranges[(model_module_version_range, view_module_version_range)] = klass
+        self._resolved.clear()
         model_module = self._registry.setdefault(model_module, {})
         model_version = model_module.setdefault(model_module_version_range, {})
         model_name = model_version.setdefault(model_name, {})
@@ -219,20 +741,25 @@ class WidgetRegistry:
         view_version[view_name] = klass
 
     def get(self, model_module, model_module_version, model_name, view_module, view_module_version, view_name):
-        """Get a value"""
-        module_versions = self._registry[model_module]
-        # The python semver module doesn't work well, for example, it can't do match('3', '*')
-        # so we just take the first model module version.
-        #model_names = next(v for k, v in module_versions.items()
-        #                   if semver.match(model_module_version, k))
-        model_names = list(module_versions.values())[0]
-        view_modules = model_names[model_name]
-        view_versions = view_modules[view_module]
-        # The python semver module doesn't work well, so we just take the first view module version
-        #view_names = next(v for k, v in view_versions.items()
-        #                  if semver.match(view_module_version, k))
-        view_names = list(view_versions.values())[0]
-        widget_class = view_names[view_name]
+        """Get a value
+
+        The value registered first with version ranges matching the versions
+        is returned. If no version ranges match, the value registered first
+        for the modules and names is returned, since the front-end may use
+        other versions of the modules than the ones registered."""
+        key = (model_module, model_module_version, model_name, view_module, view_module_version, view_name)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        ranges = self._index[(model_module, model_name, view_module, view_name)]
+        widget_class = next((klass for (model_range, view_range), klass in ranges.items()
+                             if _version_matches(model_module_version, model_range)
+                             and _version_matches(view_module_version, view_range)),
+                            None)
+        if widget_class is None:
+            widget_class = next(iter(ranges.values()))
+        self._resolved[key] = widget_class
         return widget_class
 
     def items(self):
@@ -254,6 +781,7 @@ def register(widget):
                                  w['_view_module_version'].default_value,
                                  w['_view_name'].default_value,
                                  widget)
+    widget._get_sync_table()
     return widget
 
 
@@ -269,12 +797,411 @@ class Widget(LoggingHasTraits):
     # widget_types is a registry of widgets by module, version, and name:
     widget_types = WidgetRegistry()
 
+    # When auto_batch is True, changed traits are not sent one message per
+    # change, but accumulated and sent as a single update message per widget
+    # at the end of the current kernel event loop iteration. It can be set on
+    # Widget, on a widget class or on an instance.
+    auto_batch = False
+
+    # When lazy_open is True, widgets do not open their comm when they are
+    # constructed, but when they are first displayed, referenced by the state
+    # of an open widget, or when open() or model_id is used. It can be set on
+    # Widget, on a widget class, or with the lazy_open constructor argument.
+    lazy_open = False
+
+    # When chunk_size is set, messages with a buffer larger than chunk_size
+    # bytes send their buffers as a sequence of chunk messages, which the
+    # front-end reassembles. At most max_pending_chunks chunks are sent ahead
+    # of the acknowledgements of the front-end; later messages of the widget
+    # are queued until then. Both can be set on Widget, on a widget class or
+    # on an instance.
+    chunk_size = None
+    max_pending_chunks = 8
+
+    # Compression codecs for the messages sent to the front-end, as a mapping
+    # from codec names to functions compressing bytes, in order of preference.
+    # The codecs are offered to the front-end when the comm is opened, and the
+    # widgets compress their messages with the first codec the front-end
+    # accepts. Buffers and message data larger than compression_threshold
+    # bytes are compressed, except buffers which look already compressed
+    # (e.g. PNG images or videos). Compression is disabled by default (None).
+    codecs = {'zlib': zlib.compress}
+    compression_threshold = None
+
+    # Maximum number of buffers in the content-addressed buffer store of the
+    # front-end, see _BufferStore. Buffers already in the store are sent as
+    # references. The actual capacity is negotiated with the front-end; 0
+    # disables the store.
+    buffer_store_size = 256
+
+    # the kernel side of the buffer store of the front-end
+    _buffer_store = _BufferStore()
+
+    # name of the codec accepted by the front-end, if any
+    _codec = None
+
+    # When digest_buffers is True, large read-only buffers are compared by
+    # their digests when checking whether a value received from the front-end
+    # needs to be sent back. The digests are cached per buffer object, which
+    # is faster when the same buffers are compared repeatedly.
+    digest_buffers = False
+
+    # When collect_sync_stats is True, the messages and the time spent
+    # synchronizing the state are counted, see Widget.sync_stats. It can be
+    # set on Widget, on a widget class or on an instance.
+    collect_sync_stats = False
+
+    # widgets with state waiting to be sent at the end of the current
+    # event loop iteration (model_id -> widget)
+    _pending_batch = {}
+
+    # widgets with state held by Widget.hold_sync_all (model_id -> widget),
+    # None when not holding
+    _held_widgets = None
+
+    # keys of the widgets changed in other threads, waiting to be sent from
+    # the event loop (model_id -> (widget, keys)), and the lock guarding them
+    _thread_updates = {}
+    _thread_updates_lock = threading.Lock()
+
+    # the middleware of the messages sent to and received from the
+    # front-end, see register_middleware
+    _send_middleware = ()
+    _receive_middleware = ()
+
+    # Whether Widget.widgets holds weak references, see set_weak_registry
+    _weak_registry = False
+
+    # widgets kept alive by the weak registry because they were displayed
+    # (model_id -> widget)
+    _displayed_widgets = {}
+
+    # comms of garbage collected widgets waiting to be closed at the end of
+    # the current event loop iteration
+    _comms_to_close = []
+
     @classmethod
     def close_all(cls):
         for widget in list(cls.widgets.values()):
             widget.close()
 
 
+    @staticmethod
+    @contextmanager
+    def hold_sync_all():
+        """Hold syncing any state of any widget until the outermost context
+        manager exits.
+
+        The held state of all widgets changed in the block is sent in a single
+        batch_update message."""
+        if Widget._held_widgets is not None:
+            yield
+        else:
+            Widget._held_widgets = {}
+            try:
+                yield
+            finally:
+                held = Widget._held_widgets
+                Widget._held_widgets = None
+                Widget._send_batch(held.values())
+
+    @staticmethod
+    def register_middleware(middleware, direction='send', remove=False):
+        """(Un)Register a middleware for the messages of all widgets.
+
+        Parameters
+        ----------
+        middleware: callable
+            middleware will be passed four arguments for each message::
+
+                middleware(widget, msg, buffers, call_next)
+
+            where msg is the data of the message, with its 'method', and
+            buffers is the list of its binary buffers or None. The middleware
+            passes the message on by calling call_next(msg, buffers), possibly
+            with a rewritten message, or drops it by not calling call_next.
+            Middleware registered earlier sees the message first.
+        direction: 'send' or 'receive'
+            Whether the middleware handles the messages sent to the front-end,
+            before they are stored, compressed and chunked, or the messages
+            received from the front-end. comm_open messages do not go through
+            the middleware.
+        remove: bool
+            True if the middleware should be unregistered."""
+        if direction not in ('send', 'receive'):
+            raise ValueError("direction must be 'send' or 'receive', not %r" % (direction,))
+        attr = '_%s_middleware' % direction
+        chain = [m for m in getattr(Widget, attr) if m != middleware]
+        if not remove:
+            chain.append(middleware)
+        setattr(Widget, attr, tuple(chain))
+
+    @staticmethod
+    def sync_stats(reset=False):
+        """Get the statistics of the synchronization of the widgets collected
+        while collect_sync_stats is True.
+
+        Returns a dict with the counters and timers per widget class name
+        under 'classes', and per class name and trait name under 'traits'.
+        The classes count their messages_sent/received and the json_bytes
+        and buffer_bytes of these messages, and the time in seconds spent in
+        get_state, remove_buffers, set_state (including the observers it
+        triggers) and observers. The traits count the updates_sent/received
+        containing them, their json_bytes and buffer_bytes, and the time
+        spent in their observers. Sizes are measured before compression and
+        chunking.
+
+        When reset is True, the statistics are cleared afterwards."""
+        stats = {
+            'classes': {name: dict(counts) for name, counts in _sync_stats.classes.items()},
+            'traits': {},
+        }
+        for (name, trait), counts in _sync_stats.traits.items():
+            stats['traits'].setdefault(name, {})[trait] = dict(counts)
+        if reset:
+            _sync_stats.clear()
+        return stats
+
+    @staticmethod
+    def set_weak_registry(enabled=True):
+        """Make Widget.widgets hold weak references to the widgets.
+
+        When enabled, neither the registry nor the comm of a widget created
+        afterwards keep it alive, and the comms of the widgets which are
+        garbage collected are closed in a batch at the end of the current
+        event loop iteration. Displayed widgets are kept alive until they are
+        closed; other widgets, such as links, need to be referenced for as
+        long as they are used."""
+        if enabled == Widget._weak_registry:
+            return
+        Widget._weak_registry = enabled
+        if enabled:
+            Widget.widgets = weakref.WeakValueDictionary(Widget.widgets)
+        else:
+            Widget.widgets = dict(Widget.widgets)
+            Widget.widgets.update(Widget._displayed_widgets)
+            Widget._displayed_widgets = {}
+
+    @staticmethod
+    def _close_collected(comm):
+        """Close the comm of a garbage collected widget at the end of the
+        current event loop iteration."""
+        if not Widget._comms_to_close:
+            loop = _get_event_loop()
+            if loop is None:
+                comm.close()
+                return
+            loop.add_callback(Widget._close_collected_comms)
+        Widget._comms_to_close.append(comm)
+
+    @staticmethod
+    def _close_collected_comms():
+        """Close the comms of the widgets garbage collected since the last
+        event loop iteration."""
+        comms = Widget._comms_to_close
+        Widget._comms_to_close = []
+        for comm in comms:
+            comm.close()
+
+    @classmethod
+    def _get_shared_default(cls):
+        """Get the shared default instance of the class, which is opened once
+        and never modified."""
+        instance = cls.__dict__.get('_shared_default_instance')
+        if instance is None or Widget.widgets.get(instance._model_id) is not instance:
+            instance = cls()
+            cls._shared_default_instance = instance
+        return instance
+
+    @classmethod
+    def _new_shared_default(cls):
+        """Create a default instance of the class which is copied on write.
+
+        Until one of its synced traits changes, the instance is not opened,
+        and its model id is the one of the shared default instance of the
+        class, so that the widgets referencing it share one model. The
+        instance is opened with its own comm when it changes, and the
+        widgets referencing it send the new reference."""
+        instance = cls(lazy_open=True)
+        instance._open_pending = False
+        instance._shared_default = True
+        return instance
+
+    @classmethod
+    def create_many(cls, kwargs_list):
+        """Create widgets of this class, one for each dict of constructor
+        arguments in kwargs_list, and open them with a single comm_open message.
+
+        Returns the list of widgets."""
+        widgets = [cls(lazy_open=True, **kwargs) for kwargs in kwargs_list]
+        Widget._open_many(widgets)
+        return widgets
+
+    @staticmethod
+    def _open_many(widgets):
+        """Open the comms of lazily opened widgets with a single comm_open
+        message.
+
+        The comm_open message of the first widget carries the states of the
+        other widgets in its 'batch_open' entry, and the comms of the other
+        widgets are opened without a message of their own."""
+        widgets = [w for w in widgets if w._open_pending]
+        if len(widgets) < 2:
+            for widget in widgets:
+                widget.open()
+            return
+        # Create all the comms first, so that the states can reference any
+        # of the widgets.
+        for widget in widgets:
+            widget._open_pending = False
+            args = dict(target_name='jupyter.widget', primary=False)
+            if widget._model_id is not None:
+                args['comm_id'] = widget._model_id
+            widget.comm = Comm(**args)
+        carrier = widgets[0]
+        states = {}
+        batch_paths = []
+        buffers = []
+        for widget in widgets:
+            state = widget.get_state()
+            widget._update_delta_base(state)
+            state, paths, widget_buffers = widget._remove_state_buffers(state)
+            if widget.collect_sync_stats:
+                _sync_stats.count_state(widget, 'sent', state, paths, widget_buffers)
+            if widget is carrier:
+                data = {'state': state, 'buffer_paths': paths}
+            else:
+                states[widget.model_id] = {'state': state}
+                batch_paths.extend([widget.model_id, 'state'] + path for path in paths)
+            buffers.extend(widget_buffers)
+        data['batch_open'] = {'states': states, 'buffer_paths': batch_paths}
+        if buffers and Widget._buffer_store.capacity:
+            digests = _buffer_digests if carrier.digest_buffers else None
+            buffers, store = Widget._buffer_store.store_buffers(buffers, digests)
+            if store is not None:
+                data['buffer_store'] = store
+        kernel = carrier.comm.kernel
+        if kernel:
+            for widget in widgets[1:]:
+                kernel.comm_manager.register_comm(widget.comm)
+            if carrier.collect_sync_stats:
+                _sync_stats.count_message(carrier, 'sent', data, buffers)
+            carrier.comm.open(data=data, metadata=carrier._get_open_metadata(),
+                              buffers=buffers)
+
+    @staticmethod
+    def _flush_thread_updates():
+        """Send the state changed in other threads, in a single batch."""
+        with Widget._thread_updates_lock:
+            updates = Widget._thread_updates
+            Widget._thread_updates = {}
+        with Widget.hold_sync_all():
+            for widget, keys in updates.values():
+                if widget.comm is None:
+                    continue
+                for key in keys:
+                    if widget._should_send_property(key, getattr(widget, key)):
+                        widget.send_state(key)
+
+    @staticmethod
+    def _flush_pending_batch():
+        """Send the state accumulated by auto-batching widgets."""
+        pending = Widget._pending_batch
+        Widget._pending_batch = {}
+        Widget._send_batch(pending.values())
+
+    @staticmethod
+    def _send_batch(widgets):
+        """Send the held state of several widgets in one message.
+
+        The message is sent over the comm of the first widget, and the
+        frontend dispatches the updates to the other models. The updates of
+        the widgets whose messages are queued behind chunked transfers, or
+        would be chunked, are sent on their own, so that they arrive after
+        the earlier updates of these widgets."""
+        widgets = [w for w in widgets if w._states_to_send]
+        if len(widgets) == 1:
+            widgets[0]._send_states_to_send()
+            return
+        messages = []
+        for widget in widgets:
+            keys = list(widget._states_to_send)
+            widget._states_to_send.clear()
+            if widget.comm is None or widget.comm.kernel is None:
+                continue
+            message = widget._get_update_message(widget._get_update(keys))
+            if message is None:
+                continue
+            if widget._send_queue or widget._needs_chunks(message[1]):
+                widget._send(message[0], buffers=message[1])
+            else:
+                messages.append((widget, message))
+        buffers = [b for widget, (msg, widget_buffers) in messages for b in widget_buffers]
+        if len(messages) == 1 or (messages and messages[0][0]._needs_chunks(buffers)):
+            for widget, (msg, widget_buffers) in messages:
+                widget._send(msg, buffers=widget_buffers)
+        elif messages:
+            updates = {}
+            buffer_paths = []
+            for widget, (msg, widget_buffers) in messages:
+                updates[widget.model_id] = {k: v for k, v in msg.items()
+                                            if k not in ('method', 'buffer_paths')}
+                buffer_paths.extend([widget.model_id, 'state'] + path
+                                    for path in msg['buffer_paths'])
+            msg = {'method': 'batch_update', 'updates': updates, 'buffer_paths': buffer_paths}
+            messages[0][0]._send(msg, buffers=buffers)
+
+    @classmethod
+    def _get_sync_table(cls):
+        """Return the sync metadata of the synced traits of the class.
+
+        The table is a read-only mapping from trait names to _SyncTrait
+        tuples. It is computed once per class, when the class is registered
+        or first used."""
+        table = cls.__dict__.get('_sync_table')
+        if table is None:
+            table = MappingProxyType({
+                name: _SyncTrait(
+                    to_json=trait.metadata.get('to_json', cls._trait_to_json),
+                    from_json=trait.metadata.get('from_json', cls._trait_from_json),
+                    default_value=trait.default_value,
+                    delta=bool(trait.metadata.get('delta')),
+                    buffers=_trait_may_contain_buffers(trait))
+                for name, trait in cls.class_traits(sync=True).items()})
+            cls._sync_table = table
+        return table
+
+    def _get_sync_trait(self, name):
+        """Return the _SyncTrait tuple of a trait, which may not be tagged with sync=True."""
+        sync_trait = self._get_sync_table().get(name)
+        if sync_trait is None:
+            sync_trait = _SyncTrait(
+                to_json=self.trait_metadata(name, 'to_json', self._trait_to_json),
+                from_json=self.trait_metadata(name, 'from_json', self._trait_from_json),
+                default_value=self.traits()[name].default_value,
+                delta=bool(self.trait_metadata(name, 'delta')),
+                buffers=_trait_may_contain_buffers(self.traits()[name]))
+        return sync_trait
+
+    def _remove_state_buffers(self, state):
+        """Return (state_without_buffers, buffer_paths, buffers) for a state
+        of this widget, like _remove_buffers.
+
+        Only the values of the traits which may contain binary buffers are
+        searched for buffers."""
+        table = self._get_sync_table()
+        binary_state = {k: v for k, v in state.items()
+                        if k not in table or table[k].buffers}
+        if not binary_state:
+            return state, [], []
+        with self._timer('remove_buffers'):
+            binary_state, buffer_paths, buffers = _remove_buffers(binary_state)
+        if not buffers:
+            return state, [], []
+        new_state = {k: v for k, v in state.items() if k not in binary_state}
+        new_state.update(binary_state)
+        return new_state, buffer_paths, buffers
+
     @staticmethod
     def on_widget_constructed(callback):
         """Registers a callback to be called when a widget is constructed.
@@ -306,6 +1233,11 @@ class Widget(LoggingHasTraits):
                                                state['_view_module_version'],
                                                state['_view_name'])
         widget = widget_class(comm=comm)
+        metadata = msg.get('metadata', {})
+        if 'codecs' in metadata:
+            widget._accept_codecs(metadata['codecs'])
+        if 'buffer_store' in metadata:
+            Widget._buffer_store.negotiate(metadata['buffer_store'])
         if 'buffer_paths' in data:
             _put_buffers(state, data['buffer_paths'], msg['buffers'])
         widget.set_state(state)
@@ -331,7 +1263,7 @@ class Widget(LoggingHasTraits):
             'model_module': self._model_module,
             'model_module_version': self._model_module_version
         }
-        model_state, buffer_paths, buffers = _remove_buffers(self.get_state(drop_defaults=drop_defaults))
+        model_state, buffer_paths, buffers = self._remove_state_buffers(self.get_state(drop_defaults=drop_defaults))
         state['state'] = model_state
         if len(buffers) > 0:
             state['buffers'] = [{'encoding': 'base64',
@@ -341,6 +1273,8 @@ class Widget(LoggingHasTraits):
         return state
 
     def get_view_spec(self):
+        if self._open_pending:
+            self.open()
         return dict(version_major=2, version_minor=0, model_id=self._model_id)
 
     #-------------------------------------------------------------------------
@@ -363,15 +1297,38 @@ class Widget(LoggingHasTraits):
         help="EXPERIMENTAL: The number of views of the model displayed in the frontend. This attribute is experimental and may change or be removed in the future. None signifies that views will not be tracked. Set this to 0 to start tracking view creation/deletion.").tag(sync=True)
     comm = Instance('ipykernel.comm.Comm', allow_none=True)
 
+    sync_rate = Float(None, allow_none=True,
+        help="Maximum number of update messages per second sent to the front-end. Intermediate values are dropped, and the latest value is always sent at the end of the throttling window. None means no limit.")
+
     keys = List(help="The traits which are synced.")
 
     @default('keys')
     def _default_keys(self):
-        return [name for name in self.traits(sync=True)]
+        return list(self._get_sync_table())
 
     _property_lock = Dict()
+    # number of times each key was sent to the front-end
+    _state_versions = Dict()
+    # last JSON value of the delta-capable traits known to the front-end
+    _delta_base = Dict()
+    # serialized (to_json) values of the synced traits, dropped when the trait changes
+    _json_cache = Dict()
     _holding_sync = False
+    # whether the comm is to be opened lazily, see lazy_open
+    _open_pending = False
+    # whether the widget stands for the shared default instance of its class,
+    # see _new_shared_default
+    _shared_default = False
+    # the widgets whose state references the shared default in place of
+    # this widget
+    _shared_owners = Instance(weakref.WeakSet, ())
+    _throttled = False
+    _last_sync_time = 0.0
     _states_to_send = Set()
+    # messages waiting for chunk acknowledgements, as (msg, buffers) tuples
+    _send_queue = Instance(deque, ())
+    _unacked_chunks = 0
+    _transfer_count = 0
     _msg_callbacks = Instance(CallbackDispatcher, ())
 
     #-------------------------------------------------------------------------
@@ -380,14 +1337,21 @@ class Widget(LoggingHasTraits):
     def __init__(self, **kwargs):
         """Public constructor"""
         self._model_id = kwargs.pop('model_id', None)
+        lazy_open = kwargs.pop('lazy_open', self.lazy_open)
         super().__init__(**kwargs)
 
         Widget._call_widget_constructed(self)
-        self.open()
+        if lazy_open:
+            self._open_pending = True
+        else:
+            self.open()
 
     def __del__(self):
         """Object disposal"""
-        self.close()
+        if Widget._weak_registry and self.comm is not None:
+            Widget._close_collected(self.comm)
+        else:
+            self.close()
 
     #-------------------------------------------------------------------------
     # Properties
@@ -395,18 +1359,44 @@ class Widget(LoggingHasTraits):
 
     def open(self):
         """Open a comm to the frontend if one isn't already open."""
+        self._open_pending = False
+        shared_default = self._shared_default
+        self._shared_default = False
         if self.comm is None:
-            state, buffer_paths, buffers = _remove_buffers(self.get_state())
+            state = self.get_state()
+            self._update_delta_base(state)
+            state, buffer_paths, buffers = self._remove_state_buffers(state)
+            data = {'state': state, 'buffer_paths': buffer_paths}
+            if self.collect_sync_stats:
+                _sync_stats.count_state(self, 'sent', state, buffer_paths, buffers)
+            if buffers and Widget._buffer_store.capacity:
+                digests = _buffer_digests if self.digest_buffers else None
+                buffers, store = Widget._buffer_store.store_buffers(buffers, digests)
+                if store is not None:
+                    data['buffer_store'] = store
+            if self.collect_sync_stats:
+                _sync_stats.count_message(self, 'sent', data, buffers)
 
             args = dict(target_name='jupyter.widget',
-                        data={'state': state, 'buffer_paths': buffer_paths},
+                        data=data,
                         buffers=buffers,
-                        metadata={'version': __protocol_version__}
+                        metadata=self._get_open_metadata()
                         )
             if self._model_id is not None:
                 args['comm_id'] = self._model_id
 
             self.comm = Comm(**args)
+        if shared_default:
+            # The owners referenced the shared default instead of this widget
+            for owner in list(self._shared_owners):
+                owner.send_state([k for k in owner.keys if getattr(owner, k) is self])
+            self._shared_owners.clear()
+
+    def _get_open_metadata(self):
+        """Get the metadata of the comm_open message of the widget."""
+        return {'version': __protocol_version__,
+                'codecs': list(self.codecs),
+                'buffer_store': self.buffer_store_size}
 
     @observe('comm')
     def _comm_changed(self, change):
@@ -415,7 +1405,10 @@ class Widget(LoggingHasTraits):
             return
         self._model_id = self.model_id
 
-        self.comm.on_msg(self._handle_msg)
+        if Widget._weak_registry:
+            self.comm.on_msg(_weak_callback(self._handle_msg))
+        else:
+            self.comm.on_msg(self._handle_msg)
         Widget.widgets[self.model_id] = self
 
     @property
@@ -423,6 +1416,10 @@ class Widget(LoggingHasTraits):
         """Gets the model id of this widget.
 
         If a Comm doesn't exist yet, a Comm will be created automagically."""
+        if self._shared_default:
+            return type(self)._get_shared_default().model_id
+        if self._open_pending:
+            self.open()
         return self.comm.comm_id
 
     #-------------------------------------------------------------------------
@@ -435,8 +1432,12 @@ class Widget(LoggingHasTraits):
         Closes the underlying comm.
         When the comm is closed, all of the widget views are automatically
         removed from the front-end."""
+        self._open_pending = False
         if self.comm is not None:
             Widget.widgets.pop(self.model_id, None)
+            Widget._displayed_widgets.pop(self.model_id, None)
+            self._send_queue.clear()
+            self._unacked_chunks = 0
             self.comm.close()
             self.comm = None
             self._repr_mimebundle_ = None
@@ -448,17 +1449,101 @@ class Widget(LoggingHasTraits):
         ----------
         key : unicode, or iterable (optional)
             A single property's name or iterable of property names to sync with the front-end.
+            The values of these properties, or of all properties if no key is
+            given, are serialized again, so that changes made in place to
+            mutable values are sent.
         """
+        if key is None:
+            self._json_cache.clear()
+        else:
+            if not isinstance(key, str) and isinstance(key, Iterable):
+                key = list(key)
+            self._invalidate_json_cache(key)
+        message = self._get_update_message(self._get_update(key))
+        if message is not None:
+            self._send(message[0], buffers=message[1])
+
+    def _send_state_reply(self):
+        """Send the full state in reply to a request_state message.
+
+        The front-end may have been reloaded and restore its models from the
+        reply, ignoring versions, so that it sends version 0 for its changes.
+        The versions start over from 0 and the reply carries none. The reply
+        is neither stored, compressed nor chunked."""
+        # The front-end may also have lost the buffers of its store.
+        Widget._buffer_store.reset()
+        self._state_versions.clear()
+        # The reply is not encoded, since the restored models of a reloaded
+        # front-end read it directly, and the codec is negotiated again.
+        Widget._codec = None
+        message = self._get_update_message(self._get_update(versioned=False))
+        if message is not None:
+            self._send(message[0], buffers=message[1], encode=False)
+
+    def _get_update_message(self, update):
+        """Return the update message for the data returned by _get_update and
+        its buffers, or None if update is None."""
+        if update is None:
+            return None
+        state, buffer_paths, buffers = self._remove_state_buffers(update.pop('state'))
+        if self.collect_sync_stats:
+            _sync_stats.count_state(self, 'sent', state, buffer_paths, buffers)
+        msg = {'method': 'update', 'state': state, 'buffer_paths': buffer_paths}
+        msg.update(update)
+        return msg, buffers
+
+    def _get_update(self, key=None, versioned=True):
+        """Get the data of an update message for a key or iterable of keys,
+        or of the full state if key is None.
+
+        Returns a dict with the state (still containing its buffers), the new
+        versions of the keys unless versioned is False, and the splices of
+        the delta-capable keys, or None if there is nothing to send."""
         state = self.get_state(key=key)
-        if len(state) > 0:
-            if self._property_lock:  # we need to keep this dict up to date with the front-end values
-                for name, value in state.items():
-                    if name in self._property_lock:
-                        self._property_lock[name] = value
-            state, buffer_paths, buffers = _remove_buffers(state)
-            msg = {'method': 'update', 'state': state, 'buffer_paths': buffer_paths}
-            self._send(msg, buffers=buffers)
-
+        if not state:
+            return None
+        if self._property_lock:  # we need to keep this dict up to date with the front-end values
+            for name, value in state.items():
+                if name in self._property_lock:
+                    self._property_lock[name] = value
+        self._last_sync_time = time.monotonic()
+        update = {'state': state}
+        if versioned:
+            versions = self._state_versions
+            for name in state:
+                versions[name] = versions.get(name, 0) + 1
+            update['versions'] = {name: versions[name] for name in state}
+        # Sending the full state resets the base of the deltas
+        splices = self._pop_splices(state) if key is not None else {}
+        self._update_delta_base(state)
+        if splices:
+            update['splices'] = splices
+        return update
+
+    def _pop_splices(self, state):
+        """Remove the delta-capable keys from state for which sending a splice
+        against the value known to the front-end is smaller than sending the
+        full value.
+
+        Returns a dict mapping these keys to a list of splices
+        [start, delete_count, items], and updates the base of the deltas."""
+        splices = {}
+        for name in list(state):
+            if name in self._delta_base:
+                value = state[name]
+                splice = _compute_splice(self._delta_base[name], value)
+                if splice is not None and len(splice[2]) < len(value):
+                    splices[name] = [splice]
+                    self._delta_base[name] = value
+                    del state[name]
+        return splices
+
+    def _update_delta_base(self, state):
+        """Record the values of the delta-capable keys known to the front-end."""
+        table = self._get_sync_table()
+        for name, value in state.items():
+            if name in table and table[name].delta:
+                self._delta_base[name] = value
 
     def get_state(self, key=None, drop_defaults=False):
         """Gets the widget state, or a piece of it.
@@ -483,14 +1568,32 @@ class Widget(LoggingHasTraits):
         else:
             raise ValueError("key must be a string, an iterable of keys, or None")
         state = {}
-        traits = self.traits()
-        for k in keys:
-            to_json = self.trait_metadata(k, 'to_json', self._trait_to_json)
-            value = to_json(getattr(self, k), self)
-            if not drop_defaults or not self._compare(value, traits[k].default_value):
-                state[k] = value
+        table = self._get_sync_table()
+        cache = self._json_cache
+        with self._timer('get_state'):
+            for k in keys:
+                sync_trait = table.get(k) or self._get_sync_trait(k)
+                if k in cache:
+                    value = cache[k]
+                else:
+                    value = cache[k] = sync_trait.to_json(getattr(self, k), self)
+                if not drop_defaults or not self._compare(value, sync_trait.default_value):
+                    state[k] = value
         return state
 
+    def _timer(self, name, trait=None):
+        """Return a context manager adding the time spent in its block to the
+        sync statistics, if they are collected."""
+        if self.collect_sync_stats:
+            return _sync_stats.timer(self, name, trait)
+        return nullcontext()
+
+    def _invalidate_json_cache(self, key):
+        """Drop the cached serialized values of a key or an iterable of keys."""
+        cache = self._json_cache
+        for k in [key] if isinstance(key, str) else key:
+            cache.pop(k, None)
+
     def _is_numpy(self, x):
         return x.__class__.__name__ == 'ndarray' and x.__class__.__module__ == 'numpy'
 
@@ -506,11 +1609,11 @@ class Widget(LoggingHasTraits):
         # The order of these context managers is important. Properties must
         # be locked when the hold_trait_notification context manager is
         # released and notifications are fired.
-        with self._lock_property(**sync_data), self.hold_trait_notifications():
+        self._update_delta_base(sync_data)
+        with self._timer('set_state'), self._lock_property(**sync_data), self.hold_trait_notifications():
             for name in sync_data:
                 if name in self.keys:
-                    from_json = self.trait_metadata(name, 'from_json',
-                                                    self._trait_from_json)
+                    from_json = self._get_sync_trait(name).from_json
                     self.set_trait(name, from_json(sync_data[name], self))
 
     def send(self, content, buffers=None):
@@ -535,10 +1638,26 @@ class Widget(LoggingHasTraits):
 
                 callback(widget, content, buffers)
 
+            A coroutine function is run on the event loop of the kernel.
         remove: bool
             True if the callback should be unregistered."""
         self._msg_callbacks.register_callback(callback, remove=remove)
 
+    def observe(self, handler, names=All, type='change'):
+        """Setup a handler to be called when a trait changes.
+
+        Like HasTraits.observe, except that handler may also be a coroutine
+        function, which is then run on the event loop of the kernel."""
+        if inspect.iscoroutinefunction(handler):
+            handler = _CoroutineObserver(handler, self.log)
+        super().observe(handler, names=names, type=type)
+
+    def unobserve(self, handler, names=All, type='change'):
+        """Remove a trait change handler, see observe."""
+        if inspect.iscoroutinefunction(handler):
+            handler = _CoroutineObserver(handler, self.log)
+        super().unobserve(handler, names=names, type=type)
+
     def add_traits(self, **traits):
         """Dynamically add trait attributes to the Widget."""
         super().add_traits(**traits)
@@ -552,12 +1671,18 @@ class Widget(LoggingHasTraits):
         # Send the state to the frontend before the user-registered callbacks
         # are called.
         name = change['name']
-        if self.comm is not None and self.comm.kernel is not None:
+        self._json_cache.pop(name, None)
+        if self._shared_default and name in self.keys:
+            # Copy on write: the widget is opened with its own state
+            self.open()
+        elif self.comm is not None and self.comm.kernel is not None:
             # Make sure this isn't information that the front-end just sent us.
             if name in self.keys and self._should_send_property(name, getattr(self, name)):
                 # Send new state to front-end
                 self.send_state(key=name)
-        super().notify_change(change)
+        # internal traits like _property_lock and comm are not counted per trait
+        with self._timer('observers', name if name in self.keys else None):
+            super().notify_change(change)
 
     def __repr__(self):
         return self._gen_repr_from_keys(self._repr_keys())
@@ -572,14 +1697,16 @@ class Widget(LoggingHasTraits):
 
         The value should be the JSON state of the property.
 
-        NOTE: This, in addition to the single lock for all state changes, is
-        flawed.  In the future we may want to look into buffering state changes
-        back to the front-end."""
-        self._property_lock = properties
+        Locks can be nested, e.g. when an observer sets state received from
+        the front-end on the same widget. The locks of the enclosing context
+        stay in place, but are updated with what the inner context sent."""
+        outer = self._property_lock
+        self._property_lock = dict(outer, **properties)
         try:
             yield
         finally:
-            self._property_lock = {}
+            lock = self._property_lock
+            self._property_lock = {k: lock[k] for k in outer}
 
     @contextmanager
     def hold_sync(self):
@@ -592,26 +1719,91 @@ class Widget(LoggingHasTraits):
                 yield
             finally:
                 self._holding_sync = False
-                self.send_state(self._states_to_send)
-                self._states_to_send.clear()
+                self._send_states_to_send()
+
+    def _send_states_to_send(self):
+        """Send the state of the keys that were held back, if any."""
+        if not self._states_to_send:
+            return
+        if Widget._held_widgets is not None:
+            # Widget.hold_sync_all sends it when it exits
+            Widget._held_widgets[self.model_id] = self
+        else:
+            self.send_state(self._states_to_send)
+            self._states_to_send.clear()
+
+    def _queue_thread_update(self, key):
+        """Hold back a key changed in another thread than the one of the
+        event loop, until the event loop sends it with the other keys changed
+        in other threads meanwhile.
+
+        Returns False if called from the event loop thread, or if there is
+        no event loop, in which case the key should be handled right away."""
+        loop = _get_other_thread_event_loop()
+        if loop is None:
+            return False
+        with Widget._thread_updates_lock:
+            if not Widget._thread_updates:
+                loop.add_callback(Widget._flush_thread_updates)
+            Widget._thread_updates.setdefault(self.model_id, (self, set()))[1].add(key)
+        return True
+
+    def _throttle_property(self, key):
+        """Hold back a key if the last update was sent less than 1/sync_rate
+        seconds ago.
+
+        Returns False if the key should be sent right away."""
+        if not self._throttled:
+            delay = self._last_sync_time + 1 / self.sync_rate - time.monotonic()
+            loop = _get_event_loop()
+            if delay <= 0 or loop is None:
+                return False
+            loop.call_later(delay, self._flush_throttled)
+            self._throttled = True
+        self._states_to_send.add(key)
+        return True
+
+    def _flush_throttled(self):
+        """Send the keys held back by the sync rate limit."""
+        self._throttled = False
+        self._send_states_to_send()
+
+    def _batch_property(self, key):
+        """Hold back a key until the end of the current event loop iteration.
+
+        Returns False if there is no event loop to flush the batch on, in
+        which case the key should be sent right away."""
+        if not Widget._pending_batch:
+            loop = _get_event_loop()
+            if loop is None:
+                return False
+            loop.add_callback(Widget._flush_pending_batch)
+        Widget._pending_batch[self.model_id] = self
+        self._states_to_send.add(key)
+        return True
 
     def _should_send_property(self, key, value):
         """Check the property lock (property_lock)"""
-        to_json = self.trait_metadata(key, 'to_json', self._trait_to_json)
         if key in self._property_lock:
-            # model_state, buffer_paths, buffers
-            split_value = _remove_buffers({ key: to_json(value, self)})
-            split_lock = _remove_buffers({ key: self._property_lock[key]})
-            # A roundtrip conversion through json in the comparison takes care of
-            # idiosyncracies of how python data structures map to json, for example
-            # tuples get converted to lists.
-            if (jsonloads(jsondumps(split_value[0])) == split_lock[0]
-                and split_value[1] == split_lock[1]
-                and _buffer_list_equal(split_value[2], split_lock[2])):
+            to_json = self._get_sync_trait(key).to_json
+            # The comparison takes care of idiosyncracies of how python data
+            # structures map to json, for example tuples get converted to lists.
+            digests = _buffer_digests if self.digest_buffers else None
+            if _json_equal(to_json(value, self), self._property_lock[key], digests):
                 return False
-        if self._holding_sync:
+        if self._queue_thread_update(key):
+            return False
+        elif self._holding_sync:
+            self._states_to_send.add(key)
+            return False
+        elif Widget._held_widgets is not None:
+            Widget._held_widgets[self.model_id] = self
             self._states_to_send.add(key)
             return False
+        elif self.sync_rate and self._throttle_property(key):
+            return False
+        elif self.auto_batch and self._batch_property(key):
+            return False
         else:
             return True
 
@@ -620,28 +1812,82 @@ class Widget(LoggingHasTraits):
     def _handle_msg(self, msg):
         """Called when a msg is received from the front-end"""
         data = msg['content']['data']
+        buffers = msg.get('buffers')
+        if self.collect_sync_stats:
+            _sync_stats.count_message(self, 'received', data, buffers)
+        if Widget._receive_middleware:
+            self._call_middleware(Widget._receive_middleware, data, buffers, self._dispatch_msg)
+        else:
+            self._dispatch_msg(data, buffers)
+
+    def _call_middleware(self, chain, msg, buffers, handler):
+        """Pass a message through a chain of middleware ending with
+        handler(msg, buffers)."""
+        def call(index, msg, buffers):
+            if index == len(chain):
+                return handler(msg, buffers)
+            return chain[index](self, msg, buffers,
+                                lambda msg, buffers=None: call(index + 1, msg, buffers))
+        return call(0, msg, buffers)
+
+    def _dispatch_msg(self, data, buffers):
+        """Handle the data and buffers of a msg from the front-end."""
         method = data['method']
 
         if method == 'update':
             if 'state' in data:
                 state = data['state']
+                if self.collect_sync_stats:
+                    _sync_stats.count_state(self, 'received', state,
+                                            data.get('buffer_paths', []), buffers)
                 if 'buffer_paths' in data:
-                    _put_buffers(state, data['buffer_paths'], msg['buffers'])
+                    _put_buffers(state, data['buffer_paths'], buffers)
+                if 'versions' in data:
+                    state = self._drop_stale_keys(state, data['versions'])
                 self.set_state(state)
 
         # Handle a state request.
         elif method == 'request_state':
-            self.send_state()
+            self._send_state_reply()
+
+        # Handle the capacity of the buffer store of the front-end.
+        elif method == 'buffer_store':
+            Widget._buffer_store.negotiate(data.get('capacity', 0))
+
+        # Handle the codecs accepted by the front-end.
+        elif method == 'codecs':
+            self._accept_codecs(data.get('codecs', []))
+
+        # Handle the acknowledgement of a chunk of a chunked transfer.
+        elif method == 'chunk_ack':
+            self._unacked_chunks = max(self._unacked_chunks - 1, 0)
+            self._flush_send_queue()
 
         # Handle a custom msg from the front-end.
         elif method == 'custom':
             if 'content' in data:
-                self._handle_custom_msg(data['content'], msg['buffers'])
+                self._handle_custom_msg(data['content'], buffers)
 
         # Catch remainder.
         else:
             self.log.error('Unknown front-end to back-end widget msg with method "%s"' % method)
 
+    def _drop_stale_keys(self, state, versions):
+        """Drop the keys from a state received from the front-end which were
+        changed before the front-end received the latest value we sent.
+
+        versions gives, for each key, the version of the last value the
+        front-end received. The front-end will get our latest value, so
+        discarding its stale change keeps both sides consistent."""
+        current = self._state_versions
+        return {k: v for k, v in state.items()
+                if versions.get(k, 0) >= current.get(k, 0)}
+
+    def _accept_codecs(self, codecs):
+        """Use the preferred codec among the codecs the front-end can decode,
+        for all the widgets."""
+        Widget._codec = next((c for c in self.codecs if c in codecs), None)
+
     def _handle_custom_msg(self, content, buffers):
         """Called when a custom msg is received."""
         self._msg_callbacks(self, content, buffers)
@@ -657,6 +1903,10 @@ class Widget(LoggingHasTraits):
         return x
 
     def _repr_mimebundle_(self, **kwargs):
+        if self._open_pending:
+            self.open()
+        if Widget._weak_registry and self.comm is not None:
+            Widget._displayed_widgets[self.model_id] = self
         plaintext = repr(self)
         if len(plaintext) > 110:
             plaintext = plaintext[:110] + '…'
@@ -676,9 +1926,124 @@ class Widget(LoggingHasTraits):
             }
             return data
 
-    def _send(self, msg, buffers=None):
-        """Sends a message to the model in the front-end."""
+    def _send(self, msg, buffers=None, encode=True):
+        """Sends a message to the model in the front-end.
+
+        Messages sent from other threads are sent from the event loop. When
+        encode is False, the buffers are not stored, compressed or chunked.
+        """
         if self.comm is not None and self.comm.kernel is not None:
+            loop = _get_other_thread_event_loop()
+            if loop is not None:
+                loop.add_callback(self._send, msg, buffers, encode)
+            elif Widget._send_middleware:
+                self._call_middleware(Widget._send_middleware, msg, buffers,
+                                      lambda msg, buffers: self._send_message(msg, buffers, encode))
+            else:
+                self._send_message(msg, buffers, encode)
+
+    def _send_message(self, msg, buffers=None, encode=True):
+        """Store, compress and chunk the buffers of a message as negotiated
+        with the front-end, unless encode is False, and send it."""
+        if self.comm is not None and self.comm.kernel is not None:
+            if self.collect_sync_stats:
+                _sync_stats.count_message(self, 'sent', msg, buffers)
+            # The buffer store of the front-end applies the store entries in
+            # the order the messages arrive, while queued messages of this
+            # widget may arrive after later messages of other widgets, so
+            # only the messages sent right away use the store.
+            queued = bool(self._send_queue) or (encode and self._needs_chunks(buffers))
+            if (encode and not queued and buffers and Widget._buffer_store.capacity and
+                    msg['method'] in ('update', 'batch_update')):
+                digests = _buffer_digests if self.digest_buffers else None
+                buffers, store = Widget._buffer_store.store_buffers(buffers, digests)
+                if store is not None:
+                    msg = dict(msg, buffer_store=store)
+            if encode and self._codec is not None:
+                msg, buffers = self._compress(msg, buffers)
+            if encode and self._needs_chunks(buffers):
+                self._queue_chunked(msg, buffers, self.chunk_size)
+            elif self._send_queue:
+                self._send_queue.append((msg, buffers))
+            else:
+                self.comm.send(data=msg, buffers=buffers)
+
+    def _compress(self, msg, buffers):
+        """Compress the large buffers and data of a message.
+
+        The compressed message has a 'codec' entry with the name of the codec
+        and the indices of the compressed buffers. When the message data is
+        compressed, only its method and buffer store entry are kept, and the
+        compressed JSON of the data is sent as an additional last buffer."""
+        compress = self.codecs.get(self._codec)
+        threshold = self.compression_threshold
+        if compress is None or threshold is None:
+            return msg, buffers
+        buffers = list(buffers or [])
+        codec = {'name': self._codec, 'buffers': []}
+        for i, buffer in enumerate(buffers):
+            if (memoryview(buffer).nbytes > threshold and
+                    not _looks_incompressible(buffer, compress)):
+                compressed = compress(buffer)
+                if len(compressed) < memoryview(buffer).nbytes:
+                    buffers[i] = compressed
+                    codec['buffers'].append(i)
+        data = b''
+        if _json_size_exceeds(msg, threshold):
+            try:
+                data = jsondumps(msg, separators=(',', ':')).encode('utf-8')
+            except (TypeError, ValueError):
+                pass
+        if len(data) > threshold:
+            buffers.append(compress(data))
+            codec['data'] = True
+            msg = {k: msg[k] for k in ('method', 'buffer_store') if k in msg}
+        elif not codec['buffers']:
+            return msg, buffers or None
+        return dict(msg, codec=codec), buffers
+
+    def _needs_chunks(self, buffers):
+        """Return whether a message with these buffers is sent in chunks."""
+        chunk_size = self.chunk_size
+        return bool(chunk_size and buffers and any(
+            memoryview(b).nbytes > chunk_size for b in buffers))
+
+    def _queue_chunked(self, msg, buffers, chunk_size):
+        """Queue a message with its buffers split into chunk messages.
+
+        The chunks are sent first, as 'chunk' messages with a single buffer
+        each. The message itself follows without buffers, with a 'transfer'
+        entry giving the number of chunks of each buffer, from which the
+        front-end reassembles the buffers."""
+        self._transfer_count += 1
+        transfer = self._transfer_count
+        counts = []
+        sequence = 0
+        for buffer in buffers:
+            view = memoryview(buffer).cast('B')
+            chunks = [view[i:i + chunk_size]
+                      for i in range(0, len(view), chunk_size)] or [view]
+            for chunk in chunks:
+                self._send_queue.append(
+                    ({'method': 'chunk', 'transfer': transfer, 'sequence': sequence}, [chunk]))
+                sequence += 1
+            counts.append(len(chunks))
+        self._send_queue.append(
+            (dict(msg, transfer={'id': transfer, 'chunks': counts}), None))
+        self._flush_send_queue()
+
+    def _flush_send_queue(self):
+        """Send the queued messages, as long as the number of unacknowledged
+        chunks stays under max_pending_chunks."""
+        queue = self._send_queue
+        while queue and self.comm is not None:
+            msg, buffers = queue[0]
+            is_chunk = msg['method'] == 'chunk'
+            if is_chunk and self._unacked_chunks >= self.max_pending_chunks:
+                break
+            queue.popleft()
+            if is_chunk:
+                self._unacked_chunks += 1
             self.comm.send(data=msg, buffers=buffers)
 
     def _repr_keys(self):
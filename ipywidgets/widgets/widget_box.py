@@ -53,7 +53,7 @@ class Box(DOMWidget, CoreWidget):
     # Using a tuple here to force reassignment to update the list.
     # When a proper notifying-list trait exists, use that instead.
     children = TypedTuple(trait=Instance(Widget), help="List of widget children").tag(
-        sync=True, **widget_serialization)
+        sync=True, delta=True, **widget_serialization)
 
     box_style = CaselessStrEnum(
         values=['success', 'info', 'warning', 'danger', ''], default_value='',
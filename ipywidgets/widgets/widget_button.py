@@ -52,7 +52,7 @@ class Button(DOMWidget, CoreWidget):
         values=['primary', 'success', 'info', 'warning', 'danger', ''], default_value='',
         help="""Use a predefined styling for the button.""").tag(sync=True)
 
-    style = InstanceDict(ButtonStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(ButtonStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -73,7 +73,8 @@ class Button(DOMWidget, CoreWidget):
         """Register a callback to execute when the button is clicked.
 
         The callback will be called with one argument, the clicked button
-        widget instance.
+        widget instance. A coroutine function is run on the event loop of
+        the kernel, so that it does not block the kernel while it awaits.
 
         Parameters
         ----------
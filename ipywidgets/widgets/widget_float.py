@@ -175,7 +175,7 @@ class FloatSlider(_BoundedFloat):
     continuous_update = Bool(True, help="Update the value of the widget as the user is holding the slider.").tag(sync=True)
     disabled = Bool(False, help="Enable or disable user changes").tag(sync=True)
 
-    style = InstanceDict(SliderStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(SliderStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
 
 @register
@@ -217,7 +217,7 @@ class FloatLogSlider(_BoundedLogFloat):
     disabled = Bool(False, help="Enable or disable user changes").tag(sync=True)
     base = CFloat(10., help="Base for the logarithm").tag(sync=True)
 
-    style = InstanceDict(SliderStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(SliderStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
 
 @register
@@ -250,7 +250,7 @@ class FloatProgress(_BoundedFloat):
         default_value='', allow_none=True,
         help="Use a predefined styling for the progess bar.").tag(sync=True)
 
-    style = InstanceDict(ProgressStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(ProgressStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
 
 class _FloatRange(_Float):
@@ -359,4 +359,4 @@ class FloatRangeSlider(_BoundedFloatRange):
     continuous_update = Bool(True, help="Update the value of the widget as the user is sliding the slider.").tag(sync=True)
     disabled = Bool(False, help="Enable or disable user changes").tag(sync=True)
 
-    style = InstanceDict(SliderStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(SliderStyle, shared_default=True).tag(sync=True, **widget_serialization)
@@ -166,7 +166,7 @@ class IntSlider(_BoundedInt):
     continuous_update = Bool(True, help="Update the value of the widget as the user is holding the slider.").tag(sync=True)
     disabled = Bool(False, help="Enable or disable user changes").tag(sync=True)
 
-    style = InstanceDict(SliderStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(SliderStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
 
 @register
@@ -190,7 +190,7 @@ class IntProgress(_BoundedInt):
         values=['success', 'info', 'warning', 'danger', ''], default_value='',
         help="""Use a predefined styling for the progess bar.""").tag(sync=True)
 
-    style = InstanceDict(ProgressStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(ProgressStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
 
 class _IntRange(_Int):
@@ -299,5 +299,5 @@ class IntRangeSlider(_BoundedIntRange):
     readout_format = NumberFormat(
         'd', help="Format for the readout").tag(sync=True)
     continuous_update = Bool(True, help="Update the value of the widget as the user is sliding the slider.").tag(sync=True)
-    style = InstanceDict(SliderStyle, help="Slider style customizations.").tag(sync=True, **widget_serialization)
+    style = InstanceDict(SliderStyle, shared_default=True, help="Slider style customizations.").tag(sync=True, **widget_serialization)
     disabled = Bool(False, help="Enable or disable user changes").tag(sync=True)
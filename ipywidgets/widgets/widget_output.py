@@ -58,6 +58,8 @@ class Output(DOMWidget):
     _model_module_version = Unicode(__jupyter_widgets_output_version__).tag(sync=True)
 
     msg_id = Unicode('', help="Parent message id of messages to capture").tag(sync=True)
+    # outputs is not sent as splices (delta=True), since the frontend
+    # changes it too, and a splice would be applied to a different value
     outputs = TypedTuple(trait=Dict(), help="The output messages synced from the frontend.").tag(sync=True)
 
     __counter = 0
@@ -152,7 +152,7 @@ class _Selection(DescriptionWidget, ValueWidget, CoreWidget):
     _options_full = None
 
     # This being read-only means that it cannot be changed by the user.
-    _options_labels = TypedTuple(trait=Unicode(), read_only=True, help="The labels for the options.").tag(sync=True)
+    _options_labels = TypedTuple(trait=Unicode(), read_only=True, help="The labels for the options.").tag(sync=True, delta=True)
 
     disabled = Bool(help="Enable or disable user changes").tag(sync=True)
 
@@ -293,7 +293,7 @@ class _MultipleSelection(DescriptionWidget, ValueWidget, CoreWidget):
     _options_full = None
 
     # This being read-only means that it cannot be changed from the frontend!
-    _options_labels = TypedTuple(trait=Unicode(), read_only=True, help="The labels for the options.").tag(sync=True)
+    _options_labels = TypedTuple(trait=Unicode(), read_only=True, help="The labels for the options.").tag(sync=True, delta=True)
 
     disabled = Bool(help="Enable or disable user changes").tag(sync=True)
 
@@ -430,7 +430,7 @@ class ToggleButtons(_Selection):
 
     tooltips = TypedTuple(Unicode(), help="Tooltips for each button.").tag(sync=True)
     icons = TypedTuple(Unicode(), help="Icons names for each button (FontAwesome names without the fa- prefix).").tag(sync=True)
-    style = InstanceDict(ToggleButtonsStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(ToggleButtonsStyle, shared_default=True).tag(sync=True, **widget_serialization)
 
     button_style = CaselessStrEnum(
         values=['primary', 'success', 'info', 'warning', 'danger', ''],
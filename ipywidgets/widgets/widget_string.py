@@ -99,7 +99,8 @@ class Text(_String):
         Parameters
         ----------
         callback: callable
-            Will be called with exactly one argument: the Widget instance
+            Will be called with exactly one argument: the Widget instance.
+            A coroutine function is run on the event loop of the kernel.
         remove: bool (optional)
             Whether to unregister the callback
         """
@@ -130,7 +130,7 @@ class FileUpload(DescriptionWidget, ValueWidget, CoreWidget):
     button_style = CaselessStrEnum(
         values=['primary', 'success', 'info', 'warning', 'danger', ''], default_value='',
         help='Use a predefined styling for the button.').tag(sync=True)
-    style = InstanceDict(ButtonStyle).tag(sync=True, **widget_serialization)
+    style = InstanceDict(ButtonStyle, shared_default=True).tag(sync=True, **widget_serialization)
     error = Unicode(help='Error message').tag(sync=True)
     value = TypedTuple(Dict(), help='The file upload value').tag(
         sync=True, **_value_serialization)
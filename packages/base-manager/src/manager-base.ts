@@ -14,6 +14,9 @@ import {
   ICallbacks,
   put_buffers,
   remove_buffers,
+  codecs,
+  BufferStore,
+  MissingBufferError,
   resolvePromisesDict,
   ISerializedState,
   reject,
@@ -165,16 +168,122 @@ export abstract class ManagerBase implements IWidgetManager {
         return new DataView(b instanceof ArrayBuffer ? b : b.buffer);
       }
     });
-    put_buffers(data.state, buffer_paths, buffers);
-    return this.new_model(
-      {
-        model_name: data.state['_model_name'] as string,
-        model_module: data.state['_model_module'] as string,
-        model_module_version: data.state['_model_module_version'] as string,
-        comm: comm
-      },
-      data.state
-    ).catch(reject('Could not create a model.', true));
+    const options = {
+      model_name: data.state['_model_name'] as string,
+      model_module: data.state['_model_module'] as string,
+      model_module_version: data.state['_model_module_version'] as string,
+      comm: comm
+    };
+    let modelPromise: Promise<WidgetModel>;
+    let resolvedBuffers = Promise.resolve(buffers);
+    let missingBuffers = false;
+    const store = (data as any).buffer_store;
+    if (store) {
+      let stored = buffers.map(buffer => Promise.resolve(buffer));
+      try {
+        stored = this.buffer_store.apply(store, stored);
+      } catch (error) {
+        if (!(error instanceof MissingBufferError)) {
+          throw error;
+        }
+        // Start over with an empty store, and request the full state
+        this.buffer_store.clear();
+        missingBuffers = true;
+      }
+      resolvedBuffers = Promise.all(stored);
+      modelPromise = resolvedBuffers.then(resolved => {
+        put_buffers(data.state, buffer_paths, resolved);
+        return this.new_model(options, data.state);
+      });
+      // Register the model before its buffers are resolved, so that the
+      // models created after it can reference it.
+      this.register_model(comm.comm_id, modelPromise);
+    } else {
+      put_buffers(data.state, buffer_paths, buffers);
+      modelPromise = this.new_model(options, data.state);
+    }
+    const batch = (data as any).batch_open;
+    if (batch) {
+      this._open_batch(
+        batch,
+        resolvedBuffers.then(resolved => resolved.slice(buffer_paths.length))
+      );
+    }
+    // Tell the kernel which of the codecs it offers we can decode, and the
+    // capacity of our buffer store. The kernel uses both for all its
+    // widgets, so they are only sent once.
+    const metadata = msg.metadata || {};
+    const offered = (metadata['codecs'] as string[]) || [];
+    const accepted = offered.filter(name => name in codecs);
+    return modelPromise
+      .then(model => {
+        if (accepted.length > 0 && !this._codecs_sent) {
+          this._codecs_sent = true;
+          comm.send({ method: 'codecs', codecs: accepted }, {});
+        }
+        if (
+          metadata['buffer_store'] !== undefined &&
+          !this._buffer_store_sent
+        ) {
+          this._buffer_store_sent = true;
+          comm.send(
+            { method: 'buffer_store', capacity: this.buffer_store.maxCapacity },
+            {}
+          );
+        }
+        if (missingBuffers) {
+          comm.send({ method: 'request_state' }, {});
+          // The kernel forgets the codec when it replies
+          if (accepted.length > 0) {
+            comm.send({ method: 'codecs', codecs: accepted }, {});
+          }
+        }
+        return model;
+      })
+      .catch(reject('Could not create a model.', true));
+  }
+
+  /**
+   * Create the models of the widgets opened together with the model of a
+   * batched comm_open message.
+   *
+   * The comms of these widgets are already open in the kernel, so only the
+   * comm objects are created. The models are registered right away, so that
+   * the models created after them can reference them.
+   *
+   * @param batch - the `batch_open` entry of the message data, with the
+   * `states` of the models by model id and the `buffer_paths` of the buffers.
+   * @param buffers - the buffers of the batched models.
+   */
+  protected _open_batch(
+    batch: {
+      states: { [model_id: string]: { state: JSONObject } };
+      buffer_paths: (string | number)[][];
+    },
+    buffers: Promise<DataView[]>
+  ): void {
+    const states = buffers.then(resolved => {
+      put_buffers(batch.states as any, batch.buffer_paths, resolved);
+      return batch.states;
+    });
+    for (const model_id of Object.keys(batch.states)) {
+      const modelPromise = Promise.all([
+        this._create_comm(this.comm_target_name, model_id),
+        states
+      ]).then(([comm, states]) => {
+        const state = states[model_id].state;
+        return this.new_model(
+          {
+            model_name: state['_model_name'] as string,
+            model_module: state['_model_module'] as string,
+            model_module_version: state['_model_module_version'] as string,
+            comm: comm
+          },
+          state
+        );
+      });
+      this.register_model(model_id, modelPromise);
+    }
   }
 
   /**
@@ -217,7 +326,11 @@ export abstract class ManagerBase implements IWidgetManager {
             _view_name: options.view_name
           }
         },
-        { version: PROTOCOL_VERSION }
+        {
+          version: PROTOCOL_VERSION,
+          codecs: Object.keys(codecs),
+          buffer_store: this.buffer_store.maxCapacity
+        }
       );
     }
     // The options dictionary is copied since data will be added to it.
@@ -451,6 +564,10 @@ export abstract class ManagerBase implements IWidgetManager {
         model.comm_live = false;
       });
     });
+    this._codecs_sent = false;
+    // A restarted kernel starts over with an empty store
+    this._buffer_store_sent = false;
+    this.buffer_store.clear();
   }
 
   /**
@@ -467,6 +584,21 @@ export abstract class ManagerBase implements IWidgetManager {
    */
   readonly comm_target_name = 'jupyter.widget';
 
+  /**
+   * The store of the buffers received from the kernel.
+   */
+  readonly buffer_store = new BufferStore();
+
+  /**
+   * Whether the codecs we can decode were sent to the kernel.
+   */
+  protected _codecs_sent = false;
+
+  /**
+   * Whether the capacity of our buffer store was sent to the kernel.
+   */
+  protected _buffer_store_sent = false;
+
   /**
    * Load a class and return a promise to the loaded object.
    */
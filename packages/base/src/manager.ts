@@ -5,6 +5,8 @@ import { JSONObject } from '@lumino/coreutils';
 
 import { IClassicComm, ICallbacks } from './services-shim';
 
+import { BufferStore } from './utils';
+
 import {
   DOMWidgetModel,
   DOMWidgetView,
@@ -190,4 +192,10 @@ export interface IWidgetManager {
    * The default implementation just returns the original url.
    */
   resolveUrl(url: string): Promise<string>;
+
+  /**
+   * The store of the buffers received from the kernel, if the manager
+   * supports storing buffers.
+   */
+  buffer_store?: BufferStore;
 }
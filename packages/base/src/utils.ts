@@ -230,3 +230,140 @@ export function remove_buffers(
   const new_state = remove(state, []) as JSONObject;
   return { state: new_state, buffers: buffers, buffer_paths: buffer_paths };
 }
+
+/**
+ * A codec decoding data compressed in the kernel.
+ */
+export type Codec = (data: DataView) => Promise<DataView>;
+
+/**
+ * The codecs the frontend can decode, by name.
+ *
+ * The names of the codecs are sent to the kernel, which compresses large
+ * messages with a codec of this registry. More codecs can be added here.
+ */
+export const codecs: Dict<Codec> = Object.create(null);
+
+// zlib is decoded with the DecompressionStream of the browser, when available
+const DecompressionStream = (globalThis as any).DecompressionStream;
+if (DecompressionStream !== undefined) {
+  codecs['zlib'] = (data: DataView): Promise<DataView> => {
+    const stream = (new Blob([data]) as any).stream();
+    return new Response(stream.pipeThrough(new DecompressionStream('deflate')))
+      .arrayBuffer()
+      .then(buffer => new DataView(buffer));
+  };
+}
+
+/**
+ * The store entry of a message, see BufferStore.
+ */
+export interface IBufferStoreEntry {
+  capacity: number;
+  entries: [number, string, 'put' | 'ref'][];
+  reset?: boolean;
+}
+
+/**
+ * An error raised when a message references a buffer which is not stored.
+ */
+export class MissingBufferError extends Error {}
+
+/**
+ * A content-addressed store of the buffers received from the kernel.
+ *
+ * The store keeps up to `capacity` buffers, keyed on the hash of their
+ * contents, and evicts the least recently used ones. The kernel mirrors the
+ * hashes of the store to send the buffers it already holds as references.
+ * Both sides apply the same operations in the order of the messages, so
+ * the store is updated synchronously when a message is received, and holds
+ * promises of the buffers, which may still need to be decoded.
+ */
+export class BufferStore {
+  /**
+   * @param maxCapacity - the maximum capacity offered to the kernel.
+   */
+  constructor(readonly maxCapacity = 256) {}
+
+  /**
+   * Apply the store entry of a message to its buffers.
+   *
+   * @returns the buffers of the message, with the references resolved.
+   * Throws a MissingBufferError if a referenced buffer is not stored.
+   */
+  apply(
+    store: IBufferStoreEntry,
+    buffers: Promise<DataView>[]
+  ): Promise<DataView>[] {
+    if (store.reset) {
+      this._buffers.clear();
+    }
+    const resolved = buffers.slice();
+    for (const [index, hash, operation] of store.entries) {
+      const buffer = this._buffers.get(hash);
+      if (operation === 'ref') {
+        if (buffer === undefined) {
+          throw new MissingBufferError(`Missing stored buffer: ${hash}`);
+        }
+        resolved[index] = buffer;
+      }
+      // Move the buffer to the most recently used end
+      this._buffers.delete(hash);
+      this._buffers.set(hash, operation === 'ref' ? buffer! : buffers[index]);
+      while (this._buffers.size > store.capacity) {
+        this._buffers.delete(this._buffers.keys().next().value);
+      }
+    }
+    return resolved;
+  }
+
+  /**
+   * Drop all the stored buffers.
+   */
+  clear(): void {
+    this._buffers.clear();
+  }
+
+  private _buffers = new Map<string, Promise<DataView>>();
+}
+
+/**
+ * Decode the data and buffers of a message compressed in the kernel, and
+ * resolve the references of its buffer store entry.
+ *
+ * The `codec` entry of the message data gives the name of the codec and the
+ * indices of the compressed buffers. When the message data itself is
+ * compressed, it is sent as an additional last buffer.
+ *
+ * The buffer store is updated synchronously, and a MissingBufferError is
+ * thrown if a referenced buffer is not stored.
+ */
+export function decode_message(
+  data: any,
+  buffers: DataView[],
+  store?: BufferStore
+): Promise<{ data: any; buffers: DataView[] }> {
+  const codec = data.codec || { buffers: [] };
+  const decode = codecs[codec.name];
+  if (data.codec && decode === undefined) {
+    return Promise.reject(new Error(`Unknown codec: ${codec.name}`));
+  }
+  let decoded = buffers.map((buffer, i) =>
+    codec.buffers.indexOf(i) !== -1 || (codec.data && i === buffers.length - 1)
+      ? decode(buffer)
+      : Promise.resolve(buffer)
+  );
+  if (data.buffer_store && store) {
+    decoded = store.apply(data.buffer_store, decoded);
+  }
+  return Promise.all(decoded).then(decodedBuffers => {
+    let decodedData = { ...data };
+    delete decodedData.codec;
+    delete decodedData.buffer_store;
+    if (codec.data) {
+      const json = new TextDecoder().decode(decodedBuffers.pop());
+      decodedData = { ...decodedData, ...JSON.parse(json) };
+    }
+    return { data: decodedData, buffers: decodedBuffers };
+  });
+}
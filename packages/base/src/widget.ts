@@ -121,6 +121,10 @@ export class WidgetModel extends Backbone.Model {
 
     this._closed = false;
     this._state_lock = null;
+    this._state_versions = {};
+    this._chunks = {};
+    this._decoding = Promise.resolve();
+    this._pending_decodes = 0;
     this._msg_buffer = null;
     this._msg_buffer_callbacks = null;
     this._pending_msgs = 0;
@@ -210,44 +214,261 @@ export class WidgetModel extends Backbone.Model {
   _handle_comm_msg(msg: KernelMessage.ICommMsgMsg): Promise<void> {
     const data = msg.content.data as any;
     const method = data.method;
-    switch (method) {
-      case 'update':
-        this.state_change = this.state_change
-          .then(() => {
-            const state = data.state;
-            const buffer_paths = data.buffer_paths || [];
-            // Make sure the buffers are DataViews
-            const buffers = (msg.buffers || []).map(b => {
-              if (b instanceof DataView) {
-                return b;
-              } else {
-                return new DataView(b instanceof ArrayBuffer ? b : b.buffer);
-              }
-            });
-
-            utils.put_buffers(state, buffer_paths, buffers);
-            return (this.constructor as typeof WidgetModel)._deserialize_state(
-              state,
-              this.widget_manager
-            );
-          })
-          .then(state => {
-            this.set_state(state);
-          })
-          .catch(
-            utils.reject(
-              `Could not process update msg for model id: ${this.model_id}`,
-              true
-            )
+    // Make sure the buffers are DataViews
+    let buffers = (msg.buffers || []).map(b => {
+      if (b instanceof DataView) {
+        return b;
+      } else {
+        return new DataView(b instanceof ArrayBuffer ? b : b.buffer);
+      }
+    });
+    if (method === 'chunk') {
+      return this._handle_chunk(data, buffers);
+    }
+    if (data.transfer) {
+      buffers = this._take_chunked_buffers(data.transfer);
+    }
+    if (data.codec || data.buffer_store || this._pending_decodes > 0) {
+      // Decoding is asynchronous, so the messages received while a message
+      // is being decoded wait for it, to be handled in order.
+      let decoded: Promise<{ data: any; buffers: DataView[] }>;
+      try {
+        decoded =
+          data.codec || data.buffer_store
+            ? utils.decode_message(
+                data,
+                buffers,
+                this.widget_manager.buffer_store
+              )
+            : Promise.resolve({ data, buffers });
+      } catch (error) {
+        if (!(error instanceof utils.MissingBufferError)) {
+          throw error;
+        }
+        // The store lost buffers the kernel expects it to hold: start over
+        // with an empty store and the full state of the model.
+        this.widget_manager.buffer_store!.clear();
+        if (this.comm !== undefined) {
+          this.comm.send({ method: 'request_state' }, {});
+          // The kernel forgets the codec when it replies
+          this.comm.send(
+            { method: 'codecs', codecs: Object.keys(utils.codecs) },
+            {}
           );
-        return this.state_change;
+        }
+        return Promise.resolve();
+      }
+      this._pending_decodes += 1;
+      this._decoding = this._decoding
+        .then(() => decoded)
+        .then(message =>
+          this._dispatch_comm_msg(
+            message.data,
+            message.buffers,
+            message.buffers
+          )
+        )
+        .catch(
+          utils.reject(
+            `Could not decode msg for model id: ${this.model_id}`,
+            true
+          )
+        )
+        .catch(() => undefined)
+        .then(() => {
+          this._pending_decodes -= 1;
+        });
+      return this._decoding;
+    }
+    return this._dispatch_comm_msg(
+      data,
+      buffers,
+      data.transfer ? buffers : msg.buffers
+    );
+  }
+
+  /**
+   * Dispatch a received comm msg to its handler.
+   *
+   * @param data - the message data.
+   * @param buffers - the buffers of the message, as DataViews.
+   * @param customBuffers - the buffers passed to custom message handlers.
+   */
+  _dispatch_comm_msg(
+    data: any,
+    buffers: DataView[],
+    customBuffers?: (ArrayBuffer | ArrayBufferView)[]
+  ): Promise<void> {
+    switch (data.method) {
+      case 'update':
+        return this._handle_update(data, buffers);
+      case 'batch_update':
+        return this._handle_batch_update(data, buffers);
       case 'custom':
-        this.trigger('msg:custom', data.content, msg.buffers);
+        this.trigger('msg:custom', data.content, customBuffers);
         return Promise.resolve();
     }
     return Promise.resolve();
   }
 
+  /**
+   * Handle a chunk of the buffers of a chunked transfer.
+   *
+   * The chunk is stored until the message of the transfer arrives, and
+   * acknowledged so that the kernel sends the next chunks.
+   */
+  _handle_chunk(data: any, buffers: DataView[]): Promise<void> {
+    const chunks = this._chunks[data.transfer] || [];
+    chunks[data.sequence] = buffers[0];
+    this._chunks[data.transfer] = chunks;
+    if (this.comm !== undefined) {
+      this.comm.send(
+        {
+          method: 'chunk_ack',
+          transfer: data.transfer,
+          sequence: data.sequence
+        },
+        {}
+      );
+    }
+    return Promise.resolve();
+  }
+
+  /**
+   * Reassemble the buffers of a chunked transfer from the received chunks.
+   *
+   * @param transfer - the transfer entry of the message, with the transfer
+   * `id` and the number of `chunks` of each buffer.
+   */
+  _take_chunked_buffers(transfer: {
+    id: number;
+    chunks: number[];
+  }): DataView[] {
+    const chunks = this._chunks[transfer.id] || [];
+    delete this._chunks[transfer.id];
+    let sequence = 0;
+    return transfer.chunks.map(count => {
+      const parts = chunks.slice(sequence, sequence + count);
+      sequence += count;
+      const size = parts.reduce((total, part) => total + part.byteLength, 0);
+      const bytes = new Uint8Array(size);
+      let offset = 0;
+      for (const part of parts) {
+        bytes.set(
+          new Uint8Array(part.buffer, part.byteOffset, part.byteLength),
+          offset
+        );
+        offset += part.byteLength;
+      }
+      return new DataView(bytes.buffer);
+    });
+  }
+
+  /**
+   * Handle an update of the state of this model.
+   *
+   * @param data - the update message data, with `state`, `buffer_paths`
+   * and optionally `splices`.
+   * @param buffers - the binary buffers of the update.
+   */
+  _handle_update(data: any, buffers: DataView[]): Promise<void> {
+    this.state_change = this.state_change
+      .then(() => {
+        const state = data.state;
+        const buffer_paths = data.buffer_paths || [];
+        utils.put_buffers(state, buffer_paths, buffers);
+        if (data.splices) {
+          this._apply_splices(state, data.splices);
+        }
+        return (this.constructor as typeof WidgetModel)._deserialize_state(
+          state,
+          this.widget_manager
+        );
+      })
+      .then(state => {
+        if (data.versions) {
+          // Remember the kernel versions of the attributes, so that the
+          // kernel can tell which of our changes were made on stale values.
+          // This is done first, since change handlers may save changes
+          // based on the new values while the state is set.
+          this._state_versions = utils.assign(
+            this._state_versions,
+            data.versions
+          );
+        }
+        this.set_state(state);
+      })
+      .catch(
+        utils.reject(
+          `Could not process update msg for model id: ${this.model_id}`,
+          true
+        )
+      );
+    return this.state_change;
+  }
+
+  /**
+   * Apply the splices of a delta update to the serialized values of the
+   * attributes, and add the resulting values to the serialized state.
+   *
+   * Each splice is a `[start, deleteCount, items]` triple, applied in order.
+   */
+  _apply_splices(state: Dict<unknown>, splices: Dict<any[]>): void {
+    for (const key of Object.keys(splices)) {
+      let value = this.serialize({ [key]: this.get(key) })[key] as any[];
+      for (const [start, deleteCount, items] of splices[key]) {
+        value = value
+          .slice(0, start)
+          .concat(items, value.slice(start + deleteCount));
+      }
+      state[key] = value;
+    }
+  }
+
+  /**
+   * Handle a batch of updates for several models, sent over this model's comm.
+   *
+   * The buffer paths of a batch start with the model id of the model the
+   * buffer belongs to.
+   */
+  _handle_batch_update(data: any, buffers: DataView[]): Promise<void> {
+    const updates = data.updates;
+    utils.put_buffers(updates, data.buffer_paths || [], buffers);
+    return Promise.all(
+      Object.keys(updates).map(model_id => {
+        const model = this.widget_manager.get_model(model_id);
+        if (!model) {
+          console.error(`Could not find model ${model_id} for batch update`);
+          return Promise.resolve();
+        }
+        return model.then(m => m._handle_batched_update(updates[model_id]));
+      })
+    ).then(() => {
+      return;
+    });
+  }
+
+  /**
+   * Handle the update of this model from a batch received over the comm of
+   * another model.
+   *
+   * The update waits for the messages of this model still being decoded,
+   * so that the updates are applied in the order the kernel sent them.
+   */
+  _handle_batched_update(data: any): Promise<void> {
+    if (this._pending_decodes === 0) {
+      return this._handle_update(data, []);
+    }
+    this._pending_decodes += 1;
+    this._decoding = this._decoding
+      .then(() => this._handle_update(data, []))
+      .catch(() => undefined)
+      .then(() => {
+        this._pending_decodes -= 1;
+      });
+    return this._decoding;
+  }
+
   /**
    * Handle when a widget is updated from the backend.
    *
@@ -486,11 +707,16 @@ export class WidgetModel extends Backbone.Model {
 
       // split out the binary buffers
       const split = utils.remove_buffers(state);
+      const versions: Dict<number> = {};
+      for (const key of Object.keys(state)) {
+        versions[key] = this._state_versions[key] || 0;
+      }
       this.comm.send(
         {
           method: 'update',
           state: split.state,
-          buffer_paths: split.buffer_paths
+          buffer_paths: split.buffer_paths,
+          versions: versions
         },
         callbacks,
         {},
@@ -592,6 +818,10 @@ export class WidgetModel extends Backbone.Model {
   private _comm_live: boolean;
   private _closed: boolean;
   private _state_lock: any;
+  private _state_versions: Dict<number>;
+  private _chunks: Dict<DataView[]>;
+  private _decoding: Promise<void>;
+  private _pending_decodes: number;
   private _buffered_state_diff: any;
   private _msg_buffer: any;
   private _msg_buffer_callbacks: any;
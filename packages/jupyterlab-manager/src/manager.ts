@@ -10,6 +10,7 @@ import {
   WidgetModel,
   WidgetView,
   put_buffers,
+  codecs,
   ICallbacks
 } from '@jupyter-widgets/base';
 
@@ -151,12 +152,22 @@ export abstract class LabWidgetManager extends ManagerBase
             },
             this.callbacks(undefined)
           );
-
           return info.promise;
         }
       })
     );
 
+    // The kernel sends the replies uncompressed and forgets the codec, so
+    // negotiate it again for the later messages.
+    const restored = widgets_info.find(widget_info => widget_info);
+    if (restored) {
+      this._codecs_sent = true;
+      restored.comm.send(
+        { method: 'codecs', codecs: Object.keys(codecs) },
+        this.callbacks(undefined)
+      );
+    }
+
     // We put in a synchronization barrier here so that we don't have to
     // topologically sort the restored widgets. `new_model` synchronously
     // registers the widget ids before reconstructing their state
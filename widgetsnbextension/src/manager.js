@@ -141,6 +141,15 @@ export class WidgetManager extends ManagerBase {
           );
         })
         .then(function(widgets_info) {
+          // The kernel sends the replies uncompressed and forgets the codec,
+          // so negotiate it again for the later messages.
+          if (widgets_info.length > 0) {
+            that._codecs_sent = true;
+            widgets_info[0].comm.send(
+              { method: 'codecs', codecs: Object.keys(base.codecs) },
+              that.callbacks()
+            );
+          }
           return Promise.all(
             widgets_info.map(function(widget_info) {
               return that.new_model(